@@ -1,7 +1,14 @@
+import asyncio
+import json
+import anyio
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from loguru import logger
+from src.config import Config
 from src.rag_pipeline import RAGPipeline
 
 app = FastAPI(
@@ -18,8 +25,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Init RAG au démarrage
-rag = RAGPipeline()
+# Init RAG paresseuse: le worker accepte le trafic avant d'avoir chargé
+# MiniLM / Chroma / Groq (le chargement part en tâche de fond au startup)
+rag: Optional[RAGPipeline] = None
+_rag_lock = asyncio.Lock()
+_warmup_task: Optional[asyncio.Task] = None
+# Échec du warmup (index absent, clé invalide...) => /health le remonte
+_warmup_error: Optional[Exception] = None
+
+async def get_rag() -> RAGPipeline:
+    """Retourne le pipeline, en le construisant au premier appel"""
+    global rag
+    if rag is None:
+        async with _rag_lock:
+            if rag is None:
+                # load() seulement: la base est construite avant le fork (start.sh)
+                rag = await run_in_threadpool(RAGPipeline, create_if_missing=False)
+    return rag
+
+async def _warmup():
+    global _warmup_error
+    try:
+        await get_rag()
+    except Exception as e:
+        # Pas bloquant: la prochaine requête retentera l'init
+        logger.error(f"RAG warmup failed: {e}")
+        _warmup_error = e
+
+@app.on_event("startup")
+async def raise_threadpool_limit():
+    """Le travail bloquant (embedding, Chroma, Groq) tourne dans le threadpool AnyIO"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = Config.api_threadpool_size
+
+@app.on_event("startup")
+async def start_warmup():
+    """Charge le pipeline en arrière-plan sans bloquer le bind"""
+    global _warmup_task
+    _warmup_task = asyncio.create_task(_warmup())
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    """Arrête la tâche de batching des embeddings"""
+    if rag is not None:
+        await rag.embed_batcher.aclose()
 
 class QueryRequest(BaseModel):
     question: str
@@ -27,6 +76,9 @@ class QueryRequest(BaseModel):
     use_rerank: Optional[bool] = True
     use_cache: Optional[bool] = True
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest] = Field(..., min_length=1, max_length=64)
+
 @app.get("/")
 def root():
     """Health check"""
@@ -37,7 +89,7 @@ def root():
     }
 
 @app.post("/query")
-def query(req: QueryRequest):
+async def query(req: QueryRequest):
     """
     Interroge le système RAG
     
@@ -49,28 +101,88 @@ POST /query
 }
     """
     try:
-        result = rag.query(
+        pipeline = await get_rag()
+        # Embedding batché avec les requêtes concurrentes, Groq en async
+        return await pipeline.aquery(
             question=req.question,
             top_k=req.top_k,
             use_rerank=req.use_rerank,
             use_cache=req.use_cache
         )
-        return result
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest):
+    """
+    Comme /query, mais la réponse arrive au fil de la génération (NDJSON):
+    une ligne {"token": ...} par morceau, puis {"done": true, ...résultat complet}
+    """
+    pipeline = await get_rag()
+
+    async def events():
+        try:
+            async for event in pipeline.astream(
+                question=req.question,
+                top_k=req.top_k,
+                use_rerank=req.use_rerank,
+                use_cache=req.use_cache
+            ):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Statut 200 déjà envoyé => l'erreur passe dans le flux
+            yield json.dumps({"done": True, "error": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/query/batch")
+async def query_batch(req: BatchQueryRequest):
+    """
+    Plusieurs questions en une requête: embeddings en un seul batch,
+    appels Groq en parallèle. Une erreur n'annule pas les autres réponses.
+    """
+    pipeline = await get_rag()
+    results = await asyncio.gather(
+        *(
+            pipeline.aquery(
+                question=q.question,
+                top_k=q.top_k,
+                use_rerank=q.use_rerank,
+                use_cache=q.use_cache
+            )
+            for q in req.queries
+        ),
+        return_exceptions=True
+    )
+    return {
+        "results": [
+            {"error": str(r)} if isinstance(r, Exception) else r
+            for r in results
+        ]
+    }
+
 @app.get("/metrics")
-def get_metrics():
+async def get_metrics():
     """Retourne les métriques du système"""
-    return rag.get_metrics()
+    pipeline = await get_rag()
+    return await run_in_threadpool(pipeline.get_metrics)
 
 @app.get("/health")
-def health():
+async def health():
     """Health check détaillé"""
+    if rag is None:
+        if _warmup_task is not None and _warmup_task.done() and _warmup_error is not None:
+            # Warmup terminé en erreur: pas de "starting" éternel
+            return JSONResponse(
+                status_code=503,
+                content={"status": "unhealthy", "error": str(_warmup_error)}
+            )
+        # Worker up, modèle en cours de chargement
+        return {"status": "starting"}
     try:
-        stats = rag.vector_store.stats()
-        metrics = rag.get_metrics()
+        stats = await run_in_threadpool(rag.vector_store.stats)
+        metrics = await run_in_threadpool(rag.get_metrics)
         
         return {
             "status": "healthy",
@@ -85,4 +197,15 @@ def health():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from src.vector_store import ensure_index
+    # Index construit une fois ici, les workers ne font que le charger
+    ensure_index()
+    # Import string (requis pour workers > 1); "auto" => uvloop + httptools si installés
+    uvicorn.run(
+        "api.app:app",
+        host=Config.api_host,
+        port=Config.api_port,
+        workers=Config.api_workers,
+        loop="auto",
+        http="auto"
+    )
\ No newline at end of file
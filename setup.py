@@ -9,6 +9,10 @@ setup(
         for line in open("requirements.txt")
         if line.strip() and not line.startswith("#")
     ],
+    extras_require={
+        # MiniLM INT8 (ONNX Runtime, CPU) : EMBEDDING_INT8=1
+        "int8": ["optimum[onnxruntime]>=1.23.0"],
+    },
     python_requires=">=3.11",
     author="Ton Nom",
     author_email="ton.email@example.com",
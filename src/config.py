@@ -40,6 +40,23 @@ if not GROQ_API_KEY:
     )
 
 
+def _detect_device() -> str:
+    """cuda > mps > cpu (EMBEDDING_DEVICE pour forcer)"""
+    forced = (os.getenv("EMBEDDING_DEVICE") or "").strip()
+    if forced:
+        return forced
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
 class Config:
     # =========================
     # Racine du projet
@@ -59,11 +76,41 @@ class Config:
     chroma_dir = db_dir / "chroma_lvmh"
     collection_name = "lvmh_collection"
 
+    # Index HNSW (fixé à la création de la collection, sauf search_ef)
+    hnsw_space = "cosine"
+    hnsw_m = 32
+    hnsw_construction_ef = 200
+    hnsw_search_ef = 80
+    # Retrieval par scan exact numpy (matrice en RAM) au lieu d'un appel Chroma/HNSW
+    flat_search = True
+    # "float32" ou "float16": matrice (mmap / page cache) 2x plus petite, écart de score ~1e-3,
+    # mais scan ~10x plus lent (conversion float16 -> float32 par blocs à chaque requête)
+    flat_search_dtype = (os.getenv("FLAT_SEARCH_DTYPE") or "float32").strip()
+    # Matrice persistée (.npy, ouverte en mmap => partagée entre workers)
+    flat_matrix_path = chroma_dir / "flat_embeddings.npy"
+
     # =========================
     # Embeddings
     # =========================
     embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
-    embedding_device = "cpu"
+    embedding_device = _detect_device()
+    # Taille de lot du forward pass sentence-transformers (défaut lib: 32)
+    embedding_encode_batch_size = 64
+    # Une seule instance du modèle par process (False => rechargé à chaque VectorStore)
+    share_embeddings = True
+    # MiniLM quantifié INT8 (ONNX Runtime) : inference CPU plus rapide (force device=cpu).
+    # Nécessite sentence-transformers>=3.2 + pip install "optimum[onnxruntime]" (extra "int8")
+    embedding_int8 = (os.getenv("EMBEDDING_INT8") or "").strip().lower() in {"1", "true", "yes"}
+    embedding_onnx_file = "onnx/model_quint8_avx2.onnx"
+    # Cache disque des embeddings de chunks (clé = sha256 du contenu)
+    embedding_cache_path = db_dir / "embedding_cache.sqlite3"
+    # LRU mémoire des embeddings de questions
+    query_embedding_cache_size = 2048
+    # Dynamic batching des questions (API async): fenêtre + taille max du lot
+    embedding_batch_size = 32
+    embedding_batch_wait_ms = 10
+    # Ingest: chunks envoyés à Chroma par lots (évite un seul appel monolithique)
+    ingest_batch_size = 1024
 
     # =========================
     # Chunking
@@ -93,6 +140,8 @@ class Config:
 
     llm_temperature = 0.1
     llm_max_tokens = 600
+    # Appels Groq async simultanés max (rate limit)
+    llm_max_concurrency = 8
 
     # Aliases (compatibilité avec le reste du code)
     GROQ_API_KEY = llm_api_key
@@ -107,6 +156,17 @@ class Config:
     cache_ttl = 3600
     cache_max_size = 500
 
+    # Cache sémantique : réutilise la réponse d'une question "proche"
+    # (cosine entre embeddings normalisés) ET avec les mêmes nombres (2022 != 2023)
+    enable_semantic_cache = True
+    semantic_cache_threshold = 0.92
+
+    # =========================
+    # Metrics
+    # =========================
+    # Nombre de requêtes récentes pour avg / p50 / p95 latence
+    metrics_window = 1000
+
     # =========================
     # Logs
     # =========================
@@ -121,6 +181,11 @@ class Config:
     # =========================
     api_host = "0.0.0.0"
     api_port = 8000
+    # 1 process par worker: cache de réponses + /metrics sont PAR worker.
+    # Défaut 1 (chaque worker charge son MiniLM; os.cpu_count() ignore les quotas CPU)
+    api_workers = int(os.getenv("API_WORKERS") or 1)
+    # Taille du threadpool AnyIO (défaut: 40) pour les appels RAG bloquants
+    api_threadpool_size = 200
 
     # =========================
     # Validation
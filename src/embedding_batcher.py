@@ -0,0 +1,96 @@
+"""
+Dynamic batching des embeddings de questions (API async).
+Les questions arrivées dans une fenêtre de quelques ms (ou jusqu'à N questions)
+sont encodées en un seul forward pass MiniLM au lieu d'un appel par requête.
+"""
+import asyncio
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from anyio import to_thread
+from loguru import logger
+
+
+class EmbeddingBatcher:
+    """
+    File asyncio de (question, future) vidée par une tâche de fond:
+    dès la 1re question, attend max_wait_ms (ou max_batch_size questions),
+    encode le lot dans un thread puis résout chaque future avec sa ligne.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        # Créés à la 1re utilisation, dans la boucle event qui sert les requêtes
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embedding d'une question, calculé avec celles arrivées en même temps"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()  # lot complet: pas besoin d'attendre la fenêtre
+        return await future
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+
+            # Fenêtre de collecte (sauf si le lot est déjà plein)
+            if self._queue.qsize() + 1 < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            batch = [first]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            # forward pass hors de la boucle event (threadpool AnyIO, comme l'API)
+            vectors = await to_thread.run_sync(self.embed_fn, texts)
+        except Exception as e:
+            logger.error(f"Batch embedding failed ({len(texts)} questions): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vec in zip(batch, vectors):
+            if not future.done():  # requête annulée entre-temps
+                future.set_result(vec)
+
+    async def aclose(self) -> None:
+        """Arrête la tâche de fond (shutdown de l'API)"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
@@ -0,0 +1,148 @@
+"""
+Cache disque des embeddings (sqlite), clé = sha256 du texte du chunk.
+Re-créer la base ne re-calcule que les chunks qui ont changé.
+Les embeddings de questions ont en plus un petit LRU en mémoire.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Iterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+# Limite de variables SQLite par requête (IN (...))
+_SQL_BATCH = 500
+
+
+def content_sha(text: str) -> str:
+    """Hash du contenu d'un chunk (même clé côté PDFProcessor et cache)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap un modèle d'embeddings: embed_documents ne calcule que les textes
+    absents du cache, en un seul appel batché, puis les persiste.
+    embed_query passe par un LRU mémoire (questions répétées, retries, éval).
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        db_path: Path,
+        model_name: str,
+        query_cache_size: int = 2048
+    ):
+        self.base = base
+        self.db_path = Path(db_path)
+        self.model_name = model_name
+
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb ("
+                "model TEXT NOT NULL, sha TEXT NOT NULL, vec BLOB NOT NULL, "
+                "PRIMARY KEY (model, sha))"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            with conn:  # commit / rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        shas = [content_sha(t) for t in texts]
+        cached = self._lookup(set(shas))
+
+        # Misses (dédupliqués) -> un seul appel au modèle
+        missing: Dict[str, str] = {}
+        for sha, text in zip(shas, texts):
+            if sha not in cached and sha not in missing:
+                missing[sha] = text
+
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            new_rows = {
+                sha: np.asarray(vec, dtype=np.float32)
+                for sha, vec in zip(missing.keys(), vectors)
+            }
+            self._store(new_rows)
+            cached.update(new_rows)
+
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits / {len(missing)} misses")
+        return [cached[sha].tolist() for sha in shas]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._query_lock:
+            vec = self._query_cache.get(text)
+            if vec is not None:
+                self._query_cache.move_to_end(text)
+                return list(vec)
+
+        # forward pass hors du lock
+        vec = self.base.embed_query(text)
+
+        with self._query_lock:
+            self._query_cache[text] = vec
+            self._query_cache.move_to_end(text)
+            if len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return list(vec)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Version batchée de embed_query: les misses du LRU en un seul forward pass"""
+        out: Dict[str, List[float]] = {}
+        with self._query_lock:
+            for text in texts:
+                vec = self._query_cache.get(text)
+                if vec is not None:
+                    self._query_cache.move_to_end(text)
+                    out[text] = vec
+
+        missing = list(dict.fromkeys(t for t in texts if t not in out))
+        if missing:
+            vectors = self.base.embed_documents(missing)
+            with self._query_lock:
+                for text, vec in zip(missing, vectors):
+                    out[text] = vec
+                    self._query_cache[text] = vec
+                    self._query_cache.move_to_end(text)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return [list(out[t]) for t in texts]
+
+    def _lookup(self, shas: set) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        keys = list(shas)
+        with self._connect() as conn:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT sha, vec FROM emb WHERE model = ? AND sha IN ({placeholders})",
+                    [self.model_name, *batch],
+                )
+                for sha, blob in rows:
+                    found[sha] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _store(self, rows: Dict[str, np.ndarray]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO emb (model, sha, vec) VALUES (?, ?, ?)",
+                [(self.model_name, sha, vec.tobytes()) for sha, vec in rows.items()],
+            )
@@ -1,8 +1,15 @@
+import asyncio
+from typing import AsyncIterator
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from src.config import Config
 from loguru import logger
 
+_ERROR_ANSWER = (
+    "The answer could not be generated due to a system error. "
+    "Please try again or refine the question."
+)
+
 
 class LLMClient:
     def __init__(self):
@@ -18,6 +25,9 @@ class LLMClient:
             ("human", "{context}\n\nQuestion: {question}\n\nAnswer:")
         ])
 
+        # Borne les appels Groq async concurrents (rate limit)
+        self._semaphore = asyncio.Semaphore(Config.llm_max_concurrency)
+
         logger.info(f"LLM initialized: {Config.llm_model}")
 
     def _get_system_prompt(self) -> str:
@@ -61,11 +71,49 @@ A: LVMH reported total revenue of 86,153 million euros in 2023 [Page 52].
 
         except Exception as e:
             logger.error(f"LLM error: {e}")
-            return (
-                "The answer could not be generated due to a system error. "
-                "Please try again or refine the question."
+            return _ERROR_ANSWER
+
+    async def astream(self, context: str, question: str) -> AsyncIterator[str]:
+        """
+        Stream the answer token by token (same prompt / semaphore as agenerate)
+        """
+        messages = self.prompt.format_messages(
+            context=context,
+            question=question
+        )
+        emitted = False
+        try:
+            async with self._semaphore:
+                async for chunk in self.llm.astream(messages):
+                    if chunk.content:
+                        emitted = True
+                        yield chunk.content
+
+        except Exception as e:
+            logger.error(f"LLM error: {e}")
+            if emitted:
+                # réponse tronquée: ne pas la faire passer pour une réponse complète
+                raise
+            yield _ERROR_ANSWER
+
+    async def agenerate(self, context: str, question: str) -> str:
+        """
+        Async version of generate(): concurrent Groq calls, bounded by a semaphore
+        """
+        try:
+            messages = self.prompt.format_messages(
+                context=context,
+                question=question
             )
 
+            async with self._semaphore:
+                response = await self.llm.ainvoke(messages)
+            return response.content.strip()
+
+        except Exception as e:
+            logger.error(f"LLM error: {e}")
+            return _ERROR_ANSWER
+
 
 if __name__ == "__main__":
     client = LLMClient()
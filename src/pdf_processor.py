@@ -9,8 +9,36 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from src.config import Config
+from src.embedding_cache import content_sha
+from src.reranker import has_financial_terms, token_string
 from loguru import logger
 
+# Regex compilées une fois (boucle par page / par chunk)
+_WS_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\d+')
+
+
+class _CleanTable(dict):
+    """
+    Table str.translate qui supprime le non-printable (mémoïsée par codepoint).
+    Les espaces Unicode (\xa0, \u2009 fine...) deviennent ' ' au lieu d'être supprimés.
+    """
+
+    def __missing__(self, cp: int):
+        c = chr(cp)
+        if c.isspace():
+            value = ' '
+        else:
+            value = cp if c.isprintable() else None
+        self[cp] = value
+        return value
+
+
+_CLEAN_TABLE = _CleanTable()
+# Normalize financial tables: "€" -> "EUR" dans la même passe
+_CLEAN_TABLE[ord("€")] = " EUR "
+
+
 class PDFProcessor:
     def __init__(self):
         self.pdf_path = Config.pdf_path
@@ -24,9 +52,6 @@ class PDFProcessor:
     def process(self) -> List[Document]:
         """Charge et découpe le PDF"""
         logger.info("Chargement du PDF...")
-        # Normalize financial tables spacing
-        text = text.replace("EUR millions", "EUR million")
-        text = text.replace("€", " EUR ")
 
         # 1. Charger
         loader = PyPDFLoader(str(self.pdf_path))
@@ -36,10 +61,12 @@ class PDFProcessor:
         # 2. Nettoyer - les PDFs c'est souvent sale
         cleaned = []
         for page in pages:
+            # Garder que le printable + "€" -> "EUR" (translate = une passe en C)
+            text = page.page_content.translate(_CLEAN_TABLE)
             # Virer espaces multiples
-            text = re.sub(r'\s+', ' ', page.page_content)
-            # Garder que le printable
-            text = ''.join(c for c in text if c.isprintable() or c in '\n\t')
+            text = _WS_RE.sub(' ', text)
+            # Normalize financial tables spacing
+            text = text.replace("EUR millions", "EUR million")
             page.page_content = text.strip()
             cleaned.append(page)
         
@@ -50,8 +77,15 @@ class PDFProcessor:
         # 4. Enrichir métadonnées
         for i, chunk in enumerate(chunks):
             chunk.metadata['chunk_id'] = i
-            chunk.metadata['has_numbers'] = bool(re.search(r'\d+', chunk.page_content))
+            chunk.metadata['has_numbers'] = bool(_DIGIT_RE.search(chunk.page_content))
             chunk.metadata['word_count'] = len(chunk.page_content.split())
+            # Features du reranker (corpus statique => calculées une fois)
+            chunk.metadata['tokens'] = token_string(chunk.page_content)
+            chunk.metadata['fin_hit'] = has_financial_terms(chunk.page_content)
+            chunk.metadata['content_sha'] = content_sha(chunk.page_content)
+            # Aperçus pré-calculés (sources / evidence) => pas de slicing par requête
+            chunk.metadata['preview_150'] = chunk.page_content[:150]
+            chunk.metadata['preview_240'] = chunk.page_content[:240].strip()
         
         return chunks
 
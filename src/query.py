@@ -0,0 +1,22 @@
+"""
+Question préparée une seule fois (minuscules, tokens, embedding)
+et partagée entre retrieval et rerank.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True, eq=False)
+class Query:
+    raw: str
+    lower: str
+    tokens: FrozenSet[str]
+    embedding: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_text(cls, text: str, embedding: Optional[np.ndarray] = None) -> "Query":
+        raw = (text or "").strip()
+        lower = raw.lower()
+        return cls(raw=raw, lower=lower, tokens=frozenset(lower.split()), embedding=embedding)
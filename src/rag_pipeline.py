@@ -1,16 +1,41 @@
 import time
 import hashlib
 import re
-from statistics import mean
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, NamedTuple, Union, AsyncIterator
 
+import numpy as np
+from anyio import to_thread
 from loguru import logger
 
 from src.config import Config
 from src.vector_store import VectorStore
 from src.reranker import Reranker
-from src.llm_client import LLMClient
+from src.llm_client import LLMClient, _ERROR_ANSWER
+from src.embedding_batcher import EmbeddingBatcher
+from src.query import Query
+
+_ANSWER_DIGIT_RE = re.compile(r"\d")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def _number_tokens(text: str) -> frozenset:
+    """Figures of a question ("2022", "3"...): a semantic hit must have the same ones"""
+    return frozenset(_NUMBER_RE.findall(text))
+
+
+class _Pending(NamedTuple):
+    """Retrieval done, waiting for the LLM answer"""
+    question: str
+    start: float
+    docs_scores: List[Tuple[Any, float]]
+    context: str
+    sources: List[Dict[str, Any]]
+    evidence: List[Dict[str, Any]]
+    query_embedding: Optional[np.ndarray]
+    allow_cache_write: bool
 
 
 class RAGPipeline:
@@ -19,34 +44,72 @@ class RAGPipeline:
     - Vector retrieval
     - Optional reranking
     - LLM generation
-    - In-memory cache (TTL + max size)
-    - Metrics: avg latency E2E, avg latency uncached, cache hit rate
+    - Async path (aquery): batched question embeddings + concurrent Groq calls
+    - In-memory cache (TTL + max size), exact + semantic (cosine) lookup
+    - Metrics: avg / p50 / p95 latency (E2E + uncached, recent window), cache hit rate
     - Confidence scoring + evidence (differentiator)
     """
 
-    def __init__(self):
+    def __init__(self, create_if_missing: bool = True):
         logger.info("Init RAG Pipeline...")
 
         self.vector_store = VectorStore()
         if not self.vector_store.exists():
+            if not create_if_missing:
+                # API workers only load: the index is built once before they fork (start.sh)
+                raise RuntimeError(
+                    "Vector database not found - build it first: "
+                    "python -c 'from src.vector_store import ensure_index; ensure_index()'"
+                )
             logger.info("Creating vector database...")
             self.vector_store.create()
 
         self.reranker = Reranker()
         self.llm = LLMClient()
 
-        # Cache: key -> (result_dict, timestamp)
-        self.cache: Dict[str, Tuple[Dict[str, Any], datetime]] = {}
+        # Settings read once (no Config lookups / int() casts per query)
+        self._enable_cache = bool(Config.enable_cache)
+        self._enable_semantic_cache = bool(Config.enable_semantic_cache)
+        self._semantic_threshold = float(Config.semantic_cache_threshold)
+        self._cache_ttl = float(Config.cache_ttl)
+        self._cache_max = int(Config.cache_max_size)
+        self._top_k_retr = int(Config.top_k_retrieval)
+        self._top_k_final = int(Config.top_k_final)
+
+        # Async API: question embeddings coalesced across concurrent requests
+        self.embed_batcher = EmbeddingBatcher(
+            self._embed_questions,
+            max_batch_size=int(Config.embedding_batch_size),
+            max_wait_ms=float(Config.embedding_batch_wait_ms)
+        )
+
+        # Cache: key -> (result_dict, time.monotonic() stamp), LRU order (oldest first)
+        self.cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+        # Semantic cache: preallocated (cache_max, d) matrix, allocated on first write.
+        # key -> row, row -> key, free rows and a validity mask => O(1) insert / evict
+        self._cache_embeddings: Optional[np.ndarray] = None
+        self._cache_rows: Dict[str, int] = {}
+        self._cache_row_keys: List[Optional[str]] = [None] * self._cache_max
+        # MiniLM puts "revenue 2022?" and "revenue 2023?" far above the threshold
+        self._cache_row_numbers: List[Optional[frozenset]] = [None] * self._cache_max
+        self._cache_free_rows: List[int] = list(range(self._cache_max - 1, -1, -1))
+        self._cache_valid = np.zeros(self._cache_max, dtype=bool)
+
+        # Cache + metrics are shared between threads (API threadpool, parallel eval)
+        self._lock = threading.RLock()
 
         # Metrics
         self.metrics = {
             "total_queries": 0,
             "cache_hits": 0,
-            "total_latency_ms_e2e": 0,       # includes cached responses
-            "total_latency_ms_uncached": 0,  # only real pipeline cost
             "uncached_queries": 0
         }
 
+        # Latency windows (recent queries only, bounded memory)
+        self._lat_e2e: deque = deque(maxlen=int(Config.metrics_window))       # includes cached responses
+        self._lat_uncached: deque = deque(maxlen=int(Config.metrics_window))  # only real pipeline cost
+
         logger.info("✓ Pipeline ready\n")
 
     # =========================
@@ -59,9 +122,119 @@ class RAGPipeline:
         use_cache: bool = True,
         use_rerank: bool = True
     ) -> Dict[str, Any]:
+        return self._run(question, top_k, use_cache, use_rerank)
+
+    def query_with_embedding(
+        self,
+        embedding: np.ndarray,
+        question: str,
+        top_k: Optional[int] = None,
+        use_cache: bool = True,
+        use_rerank: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Same as query(), with a precomputed question embedding
+        (e.g. batch-embedded dataset): retrieval skips the embedding step.
+        """
+        return self._run(question, top_k, use_cache, use_rerank, embedding=embedding)
+
+    async def aquery(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        use_cache: bool = True,
+        use_rerank: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Async query() for the API: the question embedding is batched with
+        concurrent requests, retrieval runs in a thread, Groq is awaited.
+        """
+        staged = await self._aprepare(question, top_k, use_cache, use_rerank)
+        if not isinstance(staged, _Pending):
+            return staged
+
+        answer = await self.llm.agenerate(staged.context, staged.question)
+        return self._complete(staged, answer)
+
+    async def astream(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        use_cache: bool = True,
+        use_rerank: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming aquery(): yields {"token": ...} events while Groq generates,
+        then {"done": True, **result} (same result dict as query()).
+        """
+        staged = await self._aprepare(question, top_k, use_cache, use_rerank)
+        if not isinstance(staged, _Pending):
+            # cache hit / nothing to generate: single chunk
+            yield {"token": staged["answer"]}
+            yield {"done": True, **staged}
+            return
+
+        parts = []
+        async for token in self.llm.astream(staged.context, staged.question):
+            parts.append(token)
+            yield {"token": token}
+
+        result = self._complete(staged, "".join(parts).strip())
+        yield {"done": True, **result}
+
+    async def _aprepare(
+        self,
+        question: str,
+        top_k: Optional[int],
+        use_cache: bool,
+        use_rerank: bool
+    ) -> Union[Dict[str, Any], _Pending]:
+        start = time.monotonic()
+        question_clean = (question or "").strip()
+
+        # exact cache hit => no need to wait for the embedding batch
+        embedding = None
+        cache_on = use_cache and self._enable_cache
+        if question_clean and not (cache_on and self._get_cache(question_clean, now=start) is not None):
+            embedding = await self.embed_batcher.embed(question_clean)
+
+        # AnyIO threadpool (same limiter as the API: Config.api_threadpool_size)
+        return await to_thread.run_sync(
+            self._prepare, question, top_k, use_cache, use_rerank, embedding, start
+        )
+
+    def _run(
+        self,
+        question: str,
+        top_k: Optional[int],
+        use_cache: bool,
+        use_rerank: bool,
+        embedding: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        staged = self._prepare(question, top_k, use_cache, use_rerank, embedding)
+        if not isinstance(staged, _Pending):
+            return staged
+
+        answer = self.llm.generate(staged.context, staged.question)
+        return self._complete(staged, answer)
 
-        start = time.time()
-        self.metrics["total_queries"] += 1
+    def _prepare(
+        self,
+        question: str,
+        top_k: Optional[int],
+        use_cache: bool,
+        use_rerank: bool,
+        embedding: Optional[np.ndarray] = None,
+        start: Optional[float] = None
+    ) -> Union[Dict[str, Any], _Pending]:
+        """
+        Everything before the LLM call: cache, retrieval, rerank, context.
+        Returns the final result (cache hit / nothing found) or a _Pending.
+        """
+        # One monotonic clock read: latency start + cache TTL reference
+        start = time.monotonic() if start is None else start
+        with self._lock:
+            self.metrics["total_queries"] += 1
 
         question_clean = (question or "").strip()
         if not question_clean:
@@ -75,14 +248,21 @@ class RAGPipeline:
             )
 
         # -------- Cache read --------
-        if use_cache and Config.enable_cache:
-            cached = self._get_cache(question_clean)
-            if cached is not None:
-                self.metrics["cache_hits"] += 1
+        query_embedding = self._normalize(embedding) if embedding is not None else None
+        if use_cache and self._enable_cache:
+            cached = self._get_cache(question_clean, now=start)
+            if cached is None and self._enable_semantic_cache:
+                # exact miss -> look for a near-duplicate question
+                if query_embedding is None:
+                    query_embedding = self._embed_question(question_clean)
+                cached = self._get_semantic_cache(query_embedding, question_clean, now=start)
 
+            if cached is not None:
                 # measure E2E latency even for cache hits (network/UI will add more)
-                latency_ms = int((time.time() - start) * 1000)
-                self.metrics["total_latency_ms_e2e"] += latency_ms
+                latency_ms = int((time.monotonic() - start) * 1000)
+                with self._lock:
+                    self.metrics["cache_hits"] += 1
+                    self._lat_e2e.append(latency_ms)
 
                 # return a fresh copy and overwrite fields that must be "now"
                 out = dict(cached)
@@ -91,9 +271,15 @@ class RAGPipeline:
                 out["timestamp"] = datetime.now().isoformat()
                 return out
 
+        # Tokenized once, embedding reused (semantic cache) by retrieval + rerank
+        q = Query.from_text(question_clean, embedding=query_embedding)
+
         # -------- Retrieval --------
-        k = int(top_k) if top_k is not None else int(Config.top_k_retrieval)
-        docs_scores = self.vector_store.search(question_clean, k=k)
+        k = int(top_k) if top_k is not None else self._top_k_retr
+        if embedding is not None:
+            docs_scores = self.vector_store.search_by_embedding(embedding, k=k)
+        else:
+            docs_scores = self.vector_store.search(q, k=k)
 
         if not docs_scores:
             return self._finalize(
@@ -102,31 +288,46 @@ class RAGPipeline:
                 docs_scores=[],
                 start=start,
                 from_cache=False,
-                allow_cache_write=(use_cache and Config.enable_cache)
+                allow_cache_write=(use_cache and self._enable_cache),
+                query_embedding=query_embedding
             )
 
         # -------- Reranking --------
         if use_rerank:
             docs_scores = self.reranker.rerank(
-                question_clean, docs_scores, top_k=int(Config.top_k_final)
+                q, docs_scores, top_k=self._top_k_final
             )
         else:
-            docs_scores = docs_scores[: int(Config.top_k_final)]
+            docs_scores = docs_scores[: self._top_k_final]
 
-        # -------- Context --------
-        context = self._build_context(docs_scores)
+        # -------- Context + sources + evidence (single pass) --------
+        context, sources, evidence = self._materialize(docs_scores)
 
-        # -------- LLM --------
-        answer = self.llm.generate(context, question_clean)
+        return _Pending(
+            question=question_clean,
+            start=start,
+            docs_scores=docs_scores,
+            context=context,
+            sources=sources,
+            evidence=evidence,
+            query_embedding=query_embedding,
+            allow_cache_write=(use_cache and self._enable_cache)
+        )
 
+    def _complete(self, staged: _Pending, answer: str) -> Dict[str, Any]:
         # -------- Finalize (+ cache write) --------
+        # failed / empty generations are returned but never cached
+        generated = bool(answer) and answer != _ERROR_ANSWER
         return self._finalize(
-            question=question_clean,
+            question=staged.question,
             answer=answer,
-            docs_scores=docs_scores,
-            start=start,
+            docs_scores=staged.docs_scores,
+            start=staged.start,
             from_cache=False,
-            allow_cache_write=(use_cache and Config.enable_cache)
+            allow_cache_write=staged.allow_cache_write and generated,
+            query_embedding=staged.query_embedding,
+            sources=staged.sources,
+            evidence=staged.evidence
         )
 
     # =========================
@@ -139,25 +340,29 @@ class RAGPipeline:
         docs_scores: List[Tuple[Any, float]],
         start: float,
         from_cache: bool,
-        allow_cache_write: bool
+        allow_cache_write: bool,
+        query_embedding: Optional[np.ndarray] = None,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        evidence: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
-        latency_ms = int((time.time() - start) * 1000)
+        end = time.monotonic()
+        latency_ms = int((end - start) * 1000)
 
-        # E2E always counts
-        self.metrics["total_latency_ms_e2e"] += latency_ms
+        with self._lock:
+            # E2E always counts
+            self._lat_e2e.append(latency_ms)
 
-        # Uncached only if not from cache
-        if not from_cache:
-            self.metrics["uncached_queries"] += 1
-            self.metrics["total_latency_ms_uncached"] += latency_ms
+            # Uncached only if not from cache
+            if not from_cache:
+                self.metrics["uncached_queries"] += 1
+                self._lat_uncached.append(latency_ms)
 
         confidence = self._compute_confidence(docs_scores, answer)
-        evidence = self._build_evidence(docs_scores)
 
         result = {
             "answer": answer,
-            "sources": self._format_sources(docs_scores),
-            "evidence": evidence,
+            "sources": sources or [],
+            "evidence": evidence or [],
             "confidence": confidence,
             "latency_ms": latency_ms,
             "from_cache": from_cache,
@@ -166,7 +371,7 @@ class RAGPipeline:
 
         # Cache write must use QUESTION as key (NOT answer)
         if allow_cache_write and not from_cache:
-            self._set_cache(question, result)
+            self._set_cache(question, result, embedding=query_embedding, now=end)
 
         logger.info(
             f"✓ Answer in {latency_ms} ms | cache={from_cache} | confidence={confidence.get('level')}"
@@ -180,16 +385,31 @@ class RAGPipeline:
         if not docs_scores:
             return {"level": "LOW", "score": 0.0, "reasons": ["NO_SOURCES"]}
 
-        scores = [float(s) for _, s in docs_scores if s is not None]
-        if not scores:
+        # Single pass: score aggregates + numeric chunks + distinct pages
+        top = float("-inf")
+        total = 0.0
+        n_scores = 0
+        numeric_chunks = 0
+        pages = set()
+        for d, s in docs_scores:
+            meta = d.metadata or {}
+            if meta.get("has_numbers"):
+                numeric_chunks += 1
+            pages.add(meta.get("page"))
+            if s is not None:
+                s = float(s)
+                total += s
+                n_scores += 1
+                if s > top:
+                    top = s
+
+        if not n_scores:
             return {"level": "LOW", "score": 0.0, "reasons": ["NO_SCORES"]}
 
-        top = max(scores)
-        avg = mean(scores)
+        avg = total / n_scores
+        unique_pages = len(pages)
 
-        has_numbers_answer = bool(re.search(r"\d", answer or ""))
-        numeric_chunks = sum(1 for d, _ in docs_scores if (d.metadata or {}).get("has_numbers"))
-        unique_pages = len({(d.metadata or {}).get("page") for d, _ in docs_scores})
+        has_numbers_answer = bool(_ANSWER_DIGIT_RE.search(answer or ""))
 
         score = 0.0
         reasons = []
@@ -226,87 +446,207 @@ class RAGPipeline:
         return {"level": level, "score": round(score, 3), "reasons": reasons}
 
     # =========================
-    # EVIDENCE (AUDIT FRIENDLY)
+    # CONTEXT / SOURCES / EVIDENCE (AUDIT FRIENDLY)
     # =========================
-    def _build_evidence(self, docs_scores: List[Tuple[Any, float]], max_items: int = 3) -> List[Dict[str, Any]]:
+    def _materialize(
+        self,
+        docs_scores: List[Tuple[Any, float]],
+        max_evidence: int = 3
+    ) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        One pass over the final docs -> (LLM context, sources, evidence).
+        Evidence = the first `max_evidence` docs, with a longer snippet.
+        """
+        context_parts = []
+        sources = []
         evidence = []
-        for doc, score in docs_scores[:max_items]:
-            meta = doc.metadata or {}
-            evidence.append({
-                "page": meta.get("page", "?"),
-                "score": round(float(score), 3),
-                "snippet": (doc.page_content or "")[:240].strip()
-            })
-        return evidence
 
-    # =========================
-    # HELPERS
-    # =========================
-    def _build_context(self, docs_scores: List[Tuple[Any, float]]) -> str:
-        parts = []
-        for doc, score in docs_scores:
+        for i, (doc, score) in enumerate(docs_scores):
             meta = doc.metadata or {}
             page = meta.get("page", "?")
-            parts.append(
-                f"[Page {page} | score {float(score):.2f}]\n{doc.page_content}"
-            )
-        return "\n\n---\n\n".join(parts)
-
-    def _format_sources(self, docs_scores: List[Tuple[Any, float]]) -> List[Dict[str, Any]]:
-        out = []
-        for doc, score in docs_scores:
-            meta = doc.metadata or {}
-            out.append({
-                "page": meta.get("page", "?"),
-                "score": round(float(score), 3),
-                "preview": ((doc.page_content or "")[:150] + "...")
+            content = doc.page_content or ""
+            score = float(score)
+
+            context_parts.append(f"[Page {page} | score {score:.2f}]\n{content}")
+
+            # previews are precomputed at ingest (fallback for older DBs)
+            preview = meta.get("preview_150")
+            if preview is None:
+                preview = content[:150]
+            sources.append({
+                "page": page,
+                "score": round(score, 3),
+                "preview": preview + "..."
             })
-        return out
+            if i < max_evidence:
+                snippet = meta.get("preview_240")
+                if snippet is None:
+                    snippet = content[:240].strip()
+                evidence.append({
+                    "page": page,
+                    "score": round(score, 3),
+                    "snippet": snippet
+                })
+
+        return "\n\n---\n\n".join(context_parts), sources, evidence
 
     # =========================
     # CACHE
     # =========================
     def _get_cache_key(self, question: str) -> str:
-        return hashlib.md5(question.lower().strip().encode("utf-8")).hexdigest()
+        return hashlib.blake2b(question.lower().strip().encode("utf-8"), digest_size=16).hexdigest()
 
-    def _get_cache(self, question: str) -> Optional[Dict[str, Any]]:
+    def _get_cache(self, question: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
         key = self._get_cache_key(question)
-        if key not in self.cache:
-            return None
+        return self._get_cache_entry(key, now)
 
-        cached, ts = self.cache[key]
-        if datetime.now() - ts > timedelta(seconds=int(Config.cache_ttl)):
-            del self.cache[key]
+    def _get_semantic_cache(
+        self,
+        embedding: np.ndarray,
+        question: str,
+        now: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached answer of the most similar question (cosine >= threshold)
+        that mentions the same figures (years, quarters...) as `question`.
+        """
+        numbers = _number_tokens(question)
+        with self._lock:
+            if self._cache_embeddings is None or not self._cache_rows:
+                return None
+
+            # free rows hold stale vectors: masked out
+            sims = np.where(self._cache_valid, self._cache_embeddings @ embedding, -np.inf)
+            candidates = np.flatnonzero(sims >= self._semantic_threshold)
+            for row in candidates[np.argsort(-sims[candidates])]:
+                if self._cache_row_numbers[row] != numbers:
+                    continue
+                # expired neighbour (evicted here) must not hide a valid one
+                hit = self._get_cache_entry(self._cache_row_keys[row], now)
+                if hit is not None:
+                    return hit
             return None
 
-        return cached
+    def _get_cache_entry(self, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if key not in self.cache:
+                return None
 
-    def _set_cache(self, question: str, result: Dict[str, Any]) -> None:
-        key = self._get_cache_key(question)
+            cached, ts = self.cache[key]
+            if now - ts > self._cache_ttl:
+                self._evict_cache(key)
+                return None
 
-        if len(self.cache) >= int(Config.cache_max_size):
-            oldest_key = min(self.cache, key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
+            self.cache.move_to_end(key)
+            return cached
 
-        self.cache[key] = (result.copy(), datetime.now())
+    def _set_cache(
+        self,
+        question: str,
+        result: Dict[str, Any],
+        embedding: Optional[np.ndarray] = None,
+        now: Optional[float] = None
+    ) -> None:
+        key = self._get_cache_key(question)
+        now = time.monotonic() if now is None else now
+
+        # embed outside the lock (model forward pass)
+        if self._enable_semantic_cache and embedding is None:
+            embedding = self._embed_question(question)
+
+        with self._lock:
+            if key not in self.cache and len(self.cache) >= self._cache_max:
+                oldest_key, _ = self.cache.popitem(last=False)
+                self._evict_cache(oldest_key)
+
+            self.cache[key] = (result.copy(), now)
+            self.cache.move_to_end(key)
+
+            if self._enable_semantic_cache:
+                self._set_cache_row(key, embedding, _number_tokens(question))
+
+    def _set_cache_row(self, key: str, embedding: np.ndarray, numbers: frozenset) -> None:
+        """Write the question embedding into its row (caller holds the lock)"""
+        row = self._cache_rows.get(key)
+        if row is None:
+            if not self._cache_free_rows:
+                return
+            row = self._cache_free_rows.pop()
+            self._cache_rows[key] = row
+            self._cache_row_keys[row] = key
+            self._cache_valid[row] = True
+
+        if self._cache_embeddings is None:
+            self._cache_embeddings = np.zeros((len(self._cache_valid), len(embedding)), dtype=np.float32)
+        self._cache_embeddings[row] = embedding
+        self._cache_row_numbers[row] = numbers
+
+    def _evict_cache(self, key: str) -> None:
+        with self._lock:
+            self.cache.pop(key, None)
+            row = self._cache_rows.pop(key, None)
+            if row is not None:
+                self._cache_valid[row] = False
+                self._cache_row_keys[row] = None
+                self._cache_row_numbers[row] = None
+                self._cache_free_rows.append(row)
+
+    def _embed_question(self, question: str) -> np.ndarray:
+        """
+        L2-normalized question embedding (cosine = dot product).
+        Same text as retrieval => the embedder's query LRU serves the search.
+        """
+        return self._normalize(self.vector_store.embeddings.embed_query(question))
+
+    def _embed_questions(self, questions: List[str]) -> np.ndarray:
+        """Batch of question embeddings (one forward pass) for the EmbeddingBatcher"""
+        return self.vector_store.embed_queries(questions)
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
 
     # =========================
     # METRICS
     # =========================
     def get_metrics(self) -> Dict[str, Any]:
-        tq = self.metrics["total_queries"]
-        uq = self.metrics["uncached_queries"]
+        with self._lock:
+            m = dict(self.metrics)
+            lat_e2e = np.fromiter(self._lat_e2e, dtype=np.float64)
+            lat_uncached = np.fromiter(self._lat_uncached, dtype=np.float64)
+            cache_size = len(self.cache)
 
-        avg_e2e = (self.metrics["total_latency_ms_e2e"] / tq) if tq else None
-        avg_uncached = (self.metrics["total_latency_ms_uncached"] / uq) if uq else None
-        cache_rate = (self.metrics["cache_hits"] / tq) if tq else 0.0
+        tq = m["total_queries"]
+        cache_rate = (m["cache_hits"] / tq) if tq else 0.0
+
+        e2e = self._latency_stats(lat_e2e)
+        uncached = self._latency_stats(lat_uncached)
 
         return {
             "total_queries": tq,
-            "cache_hits": self.metrics["cache_hits"],
+            "cache_hits": m["cache_hits"],
             "cache_hit_rate": round(cache_rate, 3),
-            "avg_latency_e2e_ms": round(avg_e2e, 2) if avg_e2e is not None else None,
-            "avg_latency_uncached_ms": round(avg_uncached, 2) if avg_uncached is not None else None,
-            "cache_size": len(self.cache),
+            "avg_latency_ms": e2e["avg"],
+            "avg_latency_e2e_ms": e2e["avg"],
+            "p50_latency_e2e_ms": e2e["p50"],
+            "p95_latency_e2e_ms": e2e["p95"],
+            "avg_latency_uncached_ms": uncached["avg"],
+            "p50_latency_uncached_ms": uncached["p50"],
+            "p95_latency_uncached_ms": uncached["p95"],
+            "cache_size": cache_size,
             "db_stats": self.vector_store.stats()
         }
+
+    @staticmethod
+    def _latency_stats(values: np.ndarray) -> Dict[str, Optional[float]]:
+        if not len(values):
+            return {"avg": None, "p50": None, "p95": None}
+        p50, p95 = np.percentile(values, [50, 95])
+        return {
+            "avg": round(float(values.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2)
+        }
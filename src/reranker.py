@@ -1,5 +1,53 @@
-﻿from typing import List, Tuple
+﻿import re
+from typing import List, Tuple, Union
+import numpy as np
 from langchain_core.documents import Document
+from src.query import Query
+
+# Optionnel: pip install numba => kernel de scoring compilé (une seule boucle fusionnée)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Termes financiers (construits une fois, pas à chaque doc)
+FINANCIAL_TERMS = (
+    "revenue", "net sales", "sales",
+    "eur", "€", "million", "billion"
+)
+# Une seule passe regex (C) au lieu d'un scan Python par terme
+_FIN_RE = re.compile("|".join(map(re.escape, FINANCIAL_TERMS)), re.IGNORECASE)
+
+
+def has_financial_terms(text: str) -> bool:
+    return _FIN_RE.search(text) is not None
+
+
+def token_string(text: str) -> str:
+    """
+    Tokens uniques en minuscules, encadrés d'espaces: " a b c ".
+    (Chroma n'accepte pas de set en metadata; `" w " in s` = test d'appartenance)
+    """
+    return " " + " ".join(sorted(set(text.lower().split()))) + " "
+
+
+def _fused_scores(sims, keyword_score, wc, fin, has_num, w_sim, w_kw, w_len, w_fin):
+    """Score final = somme pondérée (length score + boost financier inclus)"""
+    # Length score (ideal ~150–300 words)
+    length_score = 1.0 / (1.0 + np.abs(wc - 200.0) / 200.0)
+    # 🔥 FINANCIAL BOOST
+    financial_boost = 0.15 * fin + 0.10 * has_num
+    return (
+        w_sim * sims +
+        w_kw * keyword_score +
+        w_len * length_score +
+        w_fin * financial_boost
+    )
+
+
+if njit is not None:
+    _fused_scores = njit(cache=True, fastmath=True)(_fused_scores)
+
 
 class Reranker:
     def __init__(self):
@@ -9,51 +57,71 @@ class Reranker:
         self.length_weight = 0.1
         self.financial_weight = 0.1
 
+        if njit is not None:
+            # compile (ou charge le cache) maintenant, pas à la 1re requête
+            one = np.ones(1)
+            _fused_scores(one, one, one, one, one, 0.6, 0.2, 0.1, 0.1)
+
     def rerank(
         self,
-        query: str,
+        query: Union[str, Query],
         docs_scores: List[Tuple[Document, float]],
         top_k: int = 5
     ) -> List[Tuple[Document, float]]:
 
-        rescored = []
+        n = len(docs_scores)
+        if n == 0:
+            return []
+
+        # Query déjà tokenisée par le pipeline (str accepté: tests, scripts)
+        q = query if isinstance(query, Query) else Query.from_text(query)
+        query_words = q.tokens
+        query_keys = [f" {w} " for w in query_words]
 
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
+        # Features par doc (lookups metadata), puis scoring vectorisé numpy
+        sims = np.fromiter((s for _, s in docs_scores), dtype=np.float64, count=n)
+        overlap = np.zeros(n)
+        wc = np.empty(n)
+        fin = np.empty(n)
+        has_num = np.empty(n)
 
-        for doc, sim_score in docs_scores:
-            text = doc.page_content.lower()
+        for i, (doc, _) in enumerate(docs_scores):
+            meta = doc.metadata
 
-            # Keyword overlap
-            doc_words = set(text.split())
-            keyword_score = (
-                len(query_words & doc_words) / len(query_words)
-                if query_words else 0.0
-            )
+            # Keyword overlap (tokens pré-calculés à l'ingestion si dispo)
+            if query_words:
+                tokens = meta.get("tokens")
+                if tokens is not None:
+                    overlap[i] = sum(1 for k in query_keys if k in tokens)
+                else:
+                    overlap[i] = len(query_words & set(doc.page_content.lower().split()))
 
-            # Length score (ideal ~150–300 words)
-            wc = len(doc.page_content.split())
-            length_score = 1.0 / (1.0 + abs(wc - 200) / 200)
+            count = meta.get("word_count")
+            wc[i] = count if count is not None else len(doc.page_content.split())
+            fin[i] = self._financial_hit(doc)
+            has_num[i] = bool(meta.get("has_numbers", False))
 
-            # 🔥 FINANCIAL BOOST
-            financial_boost = 0.0
-            if any(k in text for k in [
-                "revenue", "net sales", "sales",
-                "eur", "€", "million", "billion"
-            ]):
-                financial_boost += 0.15
+        keyword_score = overlap / len(query_words) if query_words else overlap
 
-            if doc.metadata.get("has_numbers", False):
-                financial_boost += 0.10
+        final_scores = _fused_scores(
+            sims, keyword_score, wc, fin, has_num,
+            self.sim_weight, self.keyword_weight, self.length_weight, self.financial_weight
+        )
 
-            final_score = (
-                self.sim_weight * sim_score +
-                self.keyword_weight * keyword_score +
-                self.length_weight * length_score +
-                self.financial_weight * financial_boost
-            )
+        if top_k == 1:
+            # top-1: une passe (argmax = 1er max, même départage que le tri stable)
+            best = int(np.argmax(final_scores))
+            return [(docs_scores[best][0], float(final_scores[best]))]
 
-            rescored.append((doc, final_score))
+        # tri stable (à score égal, l'ordre du retriever est conservé)
+        order = np.argsort(-final_scores, kind="stable")[:top_k]
+        return [(docs_scores[i][0], float(final_scores[i])) for i in order]
 
-        rescored.sort(key=lambda x: x[1], reverse=True)
-        return rescored[:top_k]
+    @staticmethod
+    def _financial_hit(doc: Document) -> bool:
+        """Le chunk contient-il un terme financier ? (mémorisé dans les metadata)"""
+        hit = doc.metadata.get("fin_hit")
+        if hit is None:
+            hit = has_financial_terms(doc.page_content)
+            doc.metadata["fin_hit"] = hit
+        return hit
@@ -1,34 +1,82 @@
 """
 I struggled with persistence at first
 """
-from typing import List, Tuple, Optional
+import json
+import os
+from typing import List, Tuple, Optional, Union
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document 
 from src.config import Config
+from src.embedding_cache import CachedEmbeddings
 from src.pdf_processor import PDFProcessor
+from src.query import Query
 from loguru import logger
 
+# Matrice float16: scores calculés par blocs de lignes convertis en float32
+# (~1.5 Mo temporaires) au lieu d'une copie float32 de toute la matrice par requête
+_FLAT_BLOCK_ROWS = 1024
+
 class VectorStore:
+    # Embeddings partagés entre instances (Config.share_embeddings)
+    _embed_singleton: Optional[CachedEmbeddings] = None
+    
     def __init__(self):
         self.db_path = Config.chroma_dir
         
-        # Embeddings
-        logger.info(f"Chargement embeddings: {Config.embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=Config.embedding_model,
-            model_kwargs={'device': Config.embedding_device},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # Embeddings: modèle chargé une fois par process (tests, UI, éval)
+        shared = type(self)._embed_singleton if Config.share_embeddings else None
+        self.embeddings = shared or self._load_embeddings()
+        if Config.share_embeddings:
+            type(self)._embed_singleton = self.embeddings
         
         self.db: Optional[Chroma] = None
         
+        # Scan exact en mémoire: ligne i = embedding normalisé de _docs[i]
+        self._matrix: Optional[np.ndarray] = None
+        self._docs: List[Document] = []
+        self._l2_space = False
+        
         if self.exists():
             self.load()
     
+    @staticmethod
+    def _load_embeddings() -> CachedEmbeddings:
+        """MiniLM (optionnellement INT8/ONNX) + cache disque/LRU"""
+        logger.info(f"Chargement embeddings: {Config.embedding_model}")
+        model_kwargs = {'device': Config.embedding_device}
+        cache_model_name = Config.embedding_model
+        if Config.embedding_int8:
+            # Export ONNX quantifié INT8 (fourni dans le repo HF du modèle).
+            # Modèle quantifié pour CPU (avx2): cuda/mps demanderaient onnxruntime-gpu
+            if model_kwargs['device'] != 'cpu':
+                logger.warning(f"EMBEDDING_INT8: device {model_kwargs['device']} ignoré, INT8 tourne sur CPU")
+                model_kwargs['device'] = 'cpu'
+            logger.info(f"Embeddings INT8 (ONNX): {Config.embedding_onnx_file}")
+            model_kwargs['backend'] = 'onnx'
+            model_kwargs['model_kwargs'] = {'file_name': Config.embedding_onnx_file}
+            cache_model_name = f"{Config.embedding_model}:{Config.embedding_onnx_file}"
+        
+        base_embeddings = HuggingFaceEmbeddings(
+            model_name=Config.embedding_model,
+            model_kwargs=model_kwargs,
+            encode_kwargs={
+                'normalize_embeddings': True,
+                'batch_size': Config.embedding_encode_batch_size
+            }
+        )
+        # Cache disque: un re-ingest ne re-calcule que les chunks modifiés
+        return CachedEmbeddings(
+            base_embeddings,
+            db_path=Config.embedding_cache_path,
+            model_name=cache_model_name,
+            query_cache_size=Config.query_embedding_cache_size
+        )
+    
     def exists(self) -> bool:
-        """Check si la DB existe"""
-        return self.db_path.exists() and list(self.db_path.glob("*.sqlite3"))
+        """Check si la DB existe (Chroma persiste toujours dans chroma.sqlite3)"""
+        return (self.db_path / "chroma.sqlite3").is_file()
     
     def create(self, force=False):
         """Crée la DB depuis le PDF - prend 2-3 minutes"""
@@ -42,15 +90,25 @@ class VectorStore:
         processor = PDFProcessor()
         docs = processor.process()
         
+        # Libère le mmap de l'ancienne matrice avant sa ré-écriture
+        self._matrix = None
+        
         # DB - Chroma 
-        logger.info("Embedding en cours (ça prend du temps)...")
+        logger.info(f"Embedding en cours sur {Config.embedding_device} (ça prend du temps)...")
+        # Par lots: la 1re crée la collection, les suivantes s'y ajoutent
+        step = Config.ingest_batch_size
         self.db = Chroma.from_documents(
-            documents=docs,
+            documents=docs[:step],
             embedding=self.embeddings,
             persist_directory=str(self.db_path),
-            collection_name=Config.collection_name
+            collection_name=Config.collection_name,
+            collection_metadata=self._hnsw_metadata()
         )
+        for i in range(step, len(docs), step):
+            self.db.add_documents(docs[i:i + step])
+            logger.info(f"  {min(i + step, len(docs))}/{len(docs)} chunks")
         
+        self._load_matrix()
         logger.info(f"✓ Base créée: {len(docs)} docs")
     
     def load(self):
@@ -59,11 +117,95 @@ class VectorStore:
         self.db = Chroma(
             persist_directory=str(self.db_path),
             embedding_function=self.embeddings,
-            collection_name=Config.collection_name
+            collection_name=Config.collection_name,
+            collection_metadata=self._hnsw_metadata()
         )
+        self.set_ef_search(Config.hnsw_search_ef)
+        self._load_matrix()
         logger.info("✓ Base chargée")
     
-    def search(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
+    def _load_matrix(self):
+        """
+        Matrice des embeddings (+ docs) pour un scan exact numpy.
+        Corpus = un seul rapport (~1k chunks x 384 floats) => un GEMV, sans aller-retour Chroma.
+        La matrice est persistée en .npy et ouverte en mmap: les workers uvicorn
+        partagent les mêmes pages (page cache OS) au lieu d'une copie chacun.
+        """
+        if not Config.flat_search:
+            return
+        collection = self.db._collection
+        data = collection.get(include=["documents", "metadatas"])
+        if not data["ids"]:
+            return
+        
+        matrix = self._open_matrix_file(data["ids"])
+        if matrix is None:
+            # Fichier absent / périmé (DB recréée, autre dtype) => re-export depuis Chroma
+            data = collection.get(include=["embeddings", "documents", "metadatas"])
+            self._write_matrix_file(data["embeddings"], data["ids"])
+            matrix = self._open_matrix_file(data["ids"])
+        
+        self._matrix = matrix
+        self._docs = [
+            Document(id=doc_id, page_content=text or "", metadata=meta or {})
+            for doc_id, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        ]
+        # Même échelle de distance que Chroma (anciennes bases créées en l2)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self._l2_space = space == "l2"
+        logger.info(f"✓ Matrice d'embeddings (mmap): {self._matrix.shape} {self._matrix.dtype}")
+    
+    @staticmethod
+    def _open_matrix_file(ids: List[str]) -> Optional[np.ndarray]:
+        """np.memmap de la matrice si elle correspond aux ids (même ordre) et au dtype configuré"""
+        path = Config.flat_matrix_path
+        ids_path = path.with_suffix(".ids.json")
+        if not (path.is_file() and ids_path.is_file()):
+            return None
+        if json.loads(ids_path.read_text(encoding="utf-8")) != list(ids):
+            return None
+        matrix = np.load(path, mmap_mode="r")
+        if matrix.dtype != np.dtype(Config.flat_search_dtype):
+            return None
+        return matrix
+    
+    @staticmethod
+    def _write_matrix_file(embeddings, ids: List[str]):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+        # float16 = fichier / page cache 2x plus petit (scoring plus lent, cf. _flat_search)
+        matrix = matrix.astype(Config.flat_search_dtype, copy=False)
+        
+        # Écriture atomique (plusieurs workers peuvent reconstruire en même temps)
+        path = Config.flat_matrix_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp, matrix)
+        os.replace(tmp, path)
+        ids_tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.json")
+        ids_tmp.write_text(json.dumps(list(ids)), encoding="utf-8")
+        os.replace(ids_tmp, path.with_suffix(".ids.json"))
+        logger.info(f"✓ Matrice d'embeddings exportée: {path}")
+    
+    def set_ef_search(self, ef_search: int):
+        """Compromis latence / recall HNSW (plus grand = meilleur recall, plus lent)"""
+        try:
+            self.db._collection.modify(configuration={"hnsw": {"ef_search": int(ef_search)}})
+        except Exception as e:
+            # Anciennes versions de Chroma: search_ef figé à la création
+            logger.warning(f"ef_search non modifiable: {e}")
+    
+    @staticmethod
+    def _hnsw_metadata() -> dict:
+        return {
+            "hnsw:space": Config.hnsw_space,
+            "hnsw:M": Config.hnsw_m,
+            "hnsw:construction_ef": Config.hnsw_construction_ef,
+            "hnsw:search_ef": Config.hnsw_search_ef,
+        }
+    
+    def search(self, query: Union[str, Query], k: int = None) -> List[Tuple[Document, float]]:
         """
         Recherche par similarité
         Returns: [(doc, score), ...] triés par pertinence
@@ -71,16 +213,67 @@ class VectorStore:
         if not self.db:
             raise ValueError("DB pas chargée!")
         
+        # Query avec embedding déjà calculé (cache sémantique) => pas de re-embedding.
+        # Sinon LRU de questions (requêtes répétées: pas de forward pass),
+        # puis un seul chemin de recherche (scan numpy ou Chroma par vecteur)
+        if isinstance(query, Query):
+            embedding = query.embedding
+            if embedding is None:
+                embedding = self.embeddings.embed_query(query.raw)
+        else:
+            embedding = self.embeddings.embed_query(query)
+        return self.search_by_embedding(embedding, k=k)
+    
+    def search_by_embedding(self, embedding: np.ndarray, k: int = None) -> List[Tuple[Document, float]]:
+        """
+        Comme search(), mais avec un embedding déjà calculé (pas de re-embedding)
+        """
+        if not self.db:
+            raise ValueError("DB pas chargée!")
+        
         k = k or Config.top_k_retrieval
         
-        # Recherche
-        results = self.db.similarity_search_with_score(query, k=k)
+        if self._matrix is not None:
+            return self._flat_search(embedding, k)
         
-        # Convertir distance en similarité: 1/(1+dist)
-        results_sim = [(doc, 1.0 / (1.0 + dist)) for doc, dist in results]
-        results_sim.sort(key=lambda x: x[1], reverse=True)
+        results = self.db.similarity_search_by_vector_with_relevance_scores(
+            np.asarray(embedding, dtype=np.float32).tolist(), k=k
+        )
+        
+        return self._to_similarity(results)
+    
+    def _flat_search(self, embedding, k: int) -> List[Tuple[Document, float]]:
+        """Top-k exact: produit scalaire (cosine), argpartition puis tri des k seuls"""
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
         
-        return results_sim
+        if self._matrix.dtype == np.float32:
+            sims = self._matrix @ q
+        else:
+            # float16 @ float32 copierait toute la matrice en float32: blocs de lignes
+            sims = np.empty(len(self._matrix), dtype=np.float32)
+            for i in range(0, len(self._matrix), _FLAT_BLOCK_ROWS):
+                block = self._matrix[i:i + _FLAT_BLOCK_ROWS].astype(np.float32)
+                np.matmul(block, q, out=sims[i:i + _FLAT_BLOCK_ROWS])
+        k = min(k, len(sims))
+        idx = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+        idx = idx[np.argsort(-sims[idx])]
+        
+        # distance Chroma (cosine: 1 - cos, l2 normalisé: 2 - 2cos) -> 1/(1+dist)
+        dist = (2.0 - 2.0 * sims[idx]) if self._l2_space else (1.0 - sims[idx])
+        scores = 1.0 / (1.0 + np.maximum(dist, 0.0))
+        return [(self._docs[i], float(s)) for i, s in zip(idx, scores)]
+    
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeddings de questions en un seul forward pass (LRU mémoire, pas de cache disque) -> (N, d)"""
+        return np.asarray(self.embeddings.embed_queries(texts), dtype=np.float32)
+    
+    def _to_similarity(self, results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        # Convertir distance en similarité: 1/(1+dist)
+        # Chroma renvoie déjà par distance croissante et 1/(1+d) est décroissante => pas de re-tri
+        return [(doc, 1.0 / (1.0 + dist)) for doc, dist in results]
     
     def stats(self):
         """Stats de la DB"""
@@ -92,10 +285,20 @@ class VectorStore:
             "model": Config.embedding_model
         }
 
-if __name__ == "__main__":
-    store = VectorStore()
+def ensure_index() -> VectorStore:
+    """
+    Construit la base Chroma + la matrice flat si absentes.
+    À lancer une seule fois avant de forker les workers de l'API
+    (Chroma / le cache sqlite / le .npy ne supportent pas N écrivains en parallèle).
+    """
+    store = VectorStore()  # base existante => load() (+ export de la matrice si besoin)
     if not store.exists():
         store.create()
+    return store
+
+
+if __name__ == "__main__":
+    store = ensure_index()
     
     results = store.search("chiffre d'affaires 2023", k=3)
     print(f"\nTest recherche:")
@@ -7,8 +7,16 @@ echo " API:      http://127.0.0.1:8000"
 echo " Streamlit: http://127.0.0.1:${PORT:-7860}"
 echo "==============================================="
 
-# Lancer FastAPI en background
-uvicorn api.app:app --host 0.0.0.0 --port 8000 &
+# Construire la base + la matrice flat UNE fois, avant le fork des workers
+# (les workers ne font que load(): pas d'écritures Chroma concurrentes)
+python -c "from src.vector_store import ensure_index; ensure_index()"
+
+# Lancer FastAPI en background (uvloop + httptools)
+# 1 worker par défaut: cache et /metrics sont par worker, chaque worker charge MiniLM
+uvicorn api.app:app --host 0.0.0.0 --port 8000 \
+  --workers "${API_WORKERS:-1}" \
+  --loop uvloop \
+  --http httptools &
 
 # Lancer Streamlit au port Spaces
 streamlit run ui/app.py \
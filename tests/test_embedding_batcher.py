@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+
+from src.embedding_batcher import EmbeddingBatcher
+
+
+def test_concurrent_questions_share_one_batch():
+    """
+    EN: Questions arriving in the same window are embedded in one call.
+    FR: Requêtes concurrentes => un seul forward pass, chaque future reçoit sa ligne.
+    """
+    calls = []
+
+    def fake_embed(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+    async def scenario():
+        batcher = EmbeddingBatcher(fake_embed, max_batch_size=32, max_wait_ms=20)
+        vectors = await asyncio.gather(*(batcher.embed(q) for q in ["a", "bb", "ccc"]))
+        await batcher.aclose()
+        return vectors
+
+    vectors = asyncio.run(scenario())
+
+    assert calls == [["a", "bb", "ccc"]]
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0]
+
+
+def test_batch_size_caps_each_call():
+    """
+    EN: A full batch is flushed without waiting; the rest goes in the next call.
+    FR: max_batch_size respecté.
+    """
+    calls = []
+
+    def fake_embed(texts):
+        calls.append(len(texts))
+        return np.zeros((len(texts), 2), dtype=np.float32)
+
+    async def scenario():
+        batcher = EmbeddingBatcher(fake_embed, max_batch_size=2, max_wait_ms=1000)
+        await asyncio.wait_for(
+            asyncio.gather(*(batcher.embed(str(i)) for i in range(5))), timeout=5
+        )
+        await batcher.aclose()
+
+    asyncio.run(scenario())
+    assert sum(calls) == 5 and max(calls) == 2
+
+
+def test_embedding_errors_reach_callers():
+    """
+    EN: A failing model call fails every question of the batch.
+    FR: Pas de future bloquée si le modèle plante.
+    """
+    def broken_embed(texts):
+        raise RuntimeError("model down")
+
+    async def scenario():
+        batcher = EmbeddingBatcher(broken_embed, max_wait_ms=1)
+        results = await asyncio.gather(batcher.embed("x"), return_exceptions=True)
+        await batcher.aclose()
+        return results
+
+    (err,) = asyncio.run(scenario())
+    assert isinstance(err, RuntimeError)
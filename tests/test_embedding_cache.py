@@ -0,0 +1,92 @@
+from src.embedding_cache import CachedEmbeddings, content_sha
+
+
+class CountingEmbeddings:
+    """Fake model: counts how many texts are actually embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def test_embed_documents_only_computes_misses(tmp_path):
+    """
+    EN: Second pass hits the sqlite cache, only new texts are embedded.
+    FR: Re-ingest => seuls les chunks modifiés repassent dans le modèle.
+    """
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base, db_path=tmp_path / "emb.sqlite3", model_name="fake")
+
+    first = cache.embed_documents(["revenue 2023", "stores", "revenue 2023"])
+    assert base.embedded == ["revenue 2023", "stores"]
+    assert first[0] == first[2] == [12.0, 1.0]
+
+    # New instance => cache read back from disk
+    base2 = CountingEmbeddings()
+    cache2 = CachedEmbeddings(base2, db_path=tmp_path / "emb.sqlite3", model_name="fake")
+    second = cache2.embed_documents(["stores", "net sales"])
+
+    assert base2.embedded == ["net sales"]
+    assert second == [[6.0, 1.0], [9.0, 1.0]]
+
+
+def test_cache_is_per_model(tmp_path):
+    """
+    EN: Vectors from another model are never reused.
+    FR: Changer de modèle => pas de faux hits.
+    """
+    db = tmp_path / "emb.sqlite3"
+    CachedEmbeddings(CountingEmbeddings(), db_path=db, model_name="a").embed_documents(["x"])
+
+    base = CountingEmbeddings()
+    CachedEmbeddings(base, db_path=db, model_name="b").embed_documents(["x"])
+    assert base.embedded == ["x"]
+
+
+def test_content_sha_is_stable():
+    assert content_sha("abc") == content_sha("abc")
+    assert content_sha("abc") != content_sha("abd")
+
+
+def test_embed_query_lru(tmp_path):
+    """
+    EN: Repeated questions skip the model; least recently used is evicted.
+    FR: LRU mémoire devant le modèle pour les questions.
+    """
+    calls = []
+
+    class Base(CountingEmbeddings):
+        def embed_query(self, text):
+            calls.append(text)
+            return super().embed_query(text)
+
+    cache = CachedEmbeddings(Base(), db_path=tmp_path / "emb.sqlite3", model_name="fake", query_cache_size=2)
+
+    assert cache.embed_query("revenue") == cache.embed_query("revenue")
+    assert calls == ["revenue"]
+
+    cache.embed_query("stores")
+    cache.embed_query("revenue")      # refresh => "stores" is now LRU
+    cache.embed_query("net sales")    # evicts "stores"
+    cache.embed_query("stores")
+    assert calls == ["revenue", "stores", "net sales", "stores"]
+
+
+def test_embed_queries_batches_misses(tmp_path):
+    """
+    EN: Batched question embedding: one model call for the LRU misses.
+    FR: Les questions déjà vues sortent du LRU, le reste en un seul batch.
+    """
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base, db_path=tmp_path / "emb.sqlite3", model_name="fake")
+    cache.embed_query("ca 2023")
+
+    vectors = cache.embed_queries(["ca 2023", "stores", "stores"])
+    assert base.embedded == ["stores"]
+    assert vectors == [[7.0, 1.0], [6.0, 1.0], [6.0, 1.0]]
@@ -48,3 +48,60 @@ def test_process_adds_metadata(monkeypatch):
     assert all("has_numbers" in d.metadata for d in docs)
     assert all("word_count" in d.metadata for d in docs)
     assert all(isinstance(d.metadata["word_count"], int) for d in docs)
+
+    # Reranker features (no split / lowercase per query)
+    assert all(d.metadata["tokens"].startswith(" ") for d in docs)
+    assert all(isinstance(d.metadata["fin_hit"], bool) for d in docs)
+
+    # Precomputed previews (used by sources / evidence at query time)
+    assert all(d.metadata["preview_150"] == d.page_content[:150] for d in docs)
+    assert all(d.metadata["preview_240"] == d.page_content[:240].strip() for d in docs)
+
+
+def test_process_normalizes_currency(monkeypatch):
+    """
+    EN: "€" and "EUR millions" are normalized, whitespace and control chars cleaned.
+    FR: Les tableaux financiers utilisent tous la même notation "EUR million".
+    """
+
+    class FakeLoader:
+        def __init__(self, path: str):
+            self.path = path
+
+        def load(self):
+            return [
+                Document(page_content="Revenue:\n 86,153€\x00 (EUR millions)", metadata={"page": 10}),
+            ]
+
+    import src.pdf_processor as pdf_mod
+    monkeypatch.setattr(pdf_mod, "PyPDFLoader", FakeLoader)
+
+    docs = PDFProcessor().process()
+
+    assert docs[0].page_content == "Revenue: 86,153 EUR (EUR million)"
+
+
+def test_process_keeps_word_boundaries_on_unicode_spaces(monkeypatch):
+    """
+    EN: Non-breaking / thin spaces become plain spaces, they are not deleted.
+    FR: Le PDF LVMH contient des espaces fines: "cash flow\u2009(1)" ne doit pas coller.
+    """
+
+    class FakeLoader:
+        def __init__(self, path: str):
+            self.path = path
+
+        def load(self):
+            return [
+                Document(
+                    page_content="Revenue\xa0in\xa02023:\u202f86\u2009153 cash flow\u2009(1)\x0cNext",
+                    metadata={"page": 10}
+                ),
+            ]
+
+    import src.pdf_processor as pdf_mod
+    monkeypatch.setattr(pdf_mod, "PyPDFLoader", FakeLoader)
+
+    docs = PDFProcessor().process()
+
+    assert docs[0].page_content == "Revenue in 2023: 86 153 cash flow (1) Next"
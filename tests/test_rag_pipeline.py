@@ -92,3 +92,299 @@ def test_metrics_update(rag):
     assert metrics["total_queries"] >= 1
     assert "avg_latency_ms" in metrics
     assert "cache_hit_rate" in metrics
+
+
+def test_semantic_cache_hit(rag, monkeypatch):
+    """
+    EN: A near-duplicate question should be served from the semantic cache.
+    FR: Deux formulations proches => même réponse, sans rappeler le LLM.
+    """
+    import numpy as np
+
+    class FakeEmbeddings:
+        def embed_query(self, text):
+            # same direction for both phrasings, orthogonal otherwise
+            return [1.0, 0.0] if "revenue" in text else [0.0, 1.0]
+
+    monkeypatch.setattr(rag.vector_store, "embeddings", FakeEmbeddings())
+
+    r1 = rag.query("What is LVMH revenue in 2023?", use_cache=True)
+    assert r1["from_cache"] is False
+
+    r2 = rag.query("LVMH revenue 2023?", use_cache=True)
+    assert r2["from_cache"] is True
+    assert r2["answer"] == r1["answer"]
+
+    r3 = rag.query("How many stores?", use_cache=True)
+    assert r3["from_cache"] is False
+    assert isinstance(rag._cache_embeddings, np.ndarray)
+    assert len(rag._cache_rows) == int(rag._cache_valid.sum()) == 2
+
+
+def test_semantic_cache_requires_same_figures(rag, monkeypatch):
+    """
+    EN: Year-swapped questions embed almost identically but must not share answers.
+    FR: "revenue 2022?" ne doit jamais recevoir les chiffres 2023 depuis le cache.
+    """
+    class FakeEmbeddings:
+        def embed_query(self, text):
+            return [1.0, 0.0]  # worst case: identical embeddings
+
+    monkeypatch.setattr(rag.vector_store, "embeddings", FakeEmbeddings())
+
+    assert rag.query("What was LVMH revenue in 2023?", use_cache=True)["from_cache"] is False
+    assert rag.query("What was LVMH revenue in 2022?", use_cache=True)["from_cache"] is False
+    assert rag.query("LVMH revenue for 2022?", use_cache=True)["from_cache"] is True
+    assert rag.query("LVMH revenue?", use_cache=True)["from_cache"] is False
+
+
+def test_semantic_cache_skips_expired_neighbour(rag):
+    """
+    EN: An expired nearest neighbour does not hide a valid, slightly farther one.
+    FR: Le TTL est vérifié candidat par candidat (du plus proche au plus lointain).
+    """
+    import numpy as np
+
+    ttl = rag._cache_ttl
+    far = rag._normalize([0.95, 0.312])  # cosine ~0.95 with the query
+    rag._set_cache("LVMH total revenue 2023?", {"answer": "far"}, embedding=far, now=ttl)
+    rag._set_cache("What was LVMH revenue in 2023?", {"answer": "close"},
+                   embedding=np.array([1.0, 0.0], dtype=np.float32), now=0.0)
+
+    hit = rag._get_semantic_cache(np.array([1.0, 0.0], dtype=np.float32), "LVMH revenue 2023?", now=ttl + 1)
+
+    assert hit["answer"] == "far"
+    assert rag._get_cache_key("What was LVMH revenue in 2023?") not in rag._cache_rows
+
+
+def test_cache_lru_eviction(rag, monkeypatch):
+    """
+    EN: When the cache is full, the least recently used entry is evicted.
+    FR: Une entrée relue récemment doit survivre à l'éviction.
+    """
+    # settings are read once in __init__
+    monkeypatch.setattr(rag, "_cache_max", 2)
+    monkeypatch.setattr(rag, "_enable_semantic_cache", False)
+
+    rag.query("question A", use_cache=True)
+    rag.query("question B", use_cache=True)
+    assert rag.query("question A", use_cache=True)["from_cache"] is True
+
+    rag.query("question C", use_cache=True)  # evicts B (LRU), not A
+    assert len(rag.cache) == 2
+    assert rag.query("question A", use_cache=True)["from_cache"] is True
+    assert rag.query("question B", use_cache=True)["from_cache"] is False
+
+
+def test_semantic_cache_rows_reused_after_eviction(rag, monkeypatch):
+    """
+    EN: Evicted questions free their embedding row; the matrix never grows.
+    FR: Matrice préallouée (cache_max, d): pas de vstack / np.delete par écriture.
+    """
+    class FakeEmbeddings:
+        def embed_query(self, text):
+            return [1.0, 0.0] if text.endswith("A") else [0.0, 1.0] if text.endswith("B") else [0.6, 0.8]
+
+    monkeypatch.setattr(rag.vector_store, "embeddings", FakeEmbeddings())
+    monkeypatch.setattr(rag, "_cache_max", 2)
+
+    rag.query("question A", use_cache=True)
+    rag.query("question B", use_cache=True)
+    matrix = rag._cache_embeddings
+    row_a = rag._cache_rows[rag._get_cache_key("question A")]
+
+    rag.query("question C", use_cache=True)  # evicts A, takes over its row
+
+    assert rag._cache_embeddings is matrix
+    assert rag._cache_rows[rag._get_cache_key("question C")] == row_a
+    assert rag._get_cache_key("question A") not in rag._cache_rows
+    assert int(rag._cache_valid.sum()) == 2
+    assert rag.query("question A", use_cache=True)["from_cache"] is False
+
+
+def test_query_with_embedding_skips_reembedding(rag, monkeypatch):
+    """
+    EN: A precomputed embedding goes straight to search_by_embedding.
+    FR: Pas de re-embedding quand l'embedding est fourni (éval batchée).
+    """
+    calls = []
+
+    def fake_search_by_embedding(embedding, k=10):
+        calls.append(list(embedding))
+        doc = Document(page_content="Revenue 2023: 86,153 million euros.", metadata={"page": 10})
+        return [(doc, 0.9)]
+
+    monkeypatch.setattr(rag.vector_store, "search_by_embedding", fake_search_by_embedding)
+
+    result = rag.query_with_embedding([0.6, 0.8], "What was LVMH revenue in 2023?", use_cache=False)
+
+    assert calls == [[0.6, 0.8]]
+    assert result["sources"][0]["page"] == 10
+
+
+def test_metrics_latency_percentiles(rag):
+    """
+    EN: p50/p95 latencies are reported once queries have run.
+    FR: p95 = la métrique SLO affichée dans le dashboard.
+    """
+    assert rag.get_metrics()["p95_latency_e2e_ms"] is None
+
+    for i in range(5):
+        rag.query(f"Question {i}", use_cache=False)
+
+    metrics = rag.get_metrics()
+    assert metrics["p50_latency_e2e_ms"] is not None
+    assert metrics["p95_latency_e2e_ms"] >= metrics["p50_latency_e2e_ms"]
+    assert metrics["avg_latency_ms"] == metrics["avg_latency_e2e_ms"]
+
+
+def test_cache_ttl_expiry(rag, monkeypatch):
+    """
+    EN: Entries older than cache_ttl are not served.
+    FR: TTL basé sur time.monotonic (insensible aux sauts d'horloge).
+    """
+    import time
+    from src.config import Config
+
+    q = "What was LVMH revenue in 2023?"
+    rag.query(q, use_cache=True)
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + Config.cache_ttl + 1)
+
+    assert rag.query(q, use_cache=True)["from_cache"] is False
+
+
+def test_compute_confidence(rag):
+    """
+    EN: Confidence aggregates (top/avg similarity, pages, numeric chunks).
+    FR: Sources multi-pages et chiffrées => HIGH.
+    """
+    docs_scores = [
+        (Document(page_content="86,153", metadata={"page": 10, "has_numbers": True}), 0.90),
+        (Document(page_content="13%", metadata={"page": 11, "has_numbers": True}), 0.60),
+        (Document(page_content="n/a", metadata={"page": 11}), None),
+    ]
+    conf = rag._compute_confidence(docs_scores, "Revenue was 86,153 [Page 10].")
+    assert conf == {"level": "HIGH", "score": 0.9, "reasons": []}
+
+    conf = rag._compute_confidence(docs_scores[2:], "No numbers.")
+    assert conf["reasons"] == ["NO_SCORES"]
+
+
+def test_aquery_async_path(rag, monkeypatch):
+    """
+    EN: aquery: batched embedding -> retrieval by vector -> async LLM -> cache.
+    FR: Même résultat que query(), second appel servi par le cache.
+    """
+    import asyncio
+
+    def fake_search_by_embedding(embedding, k=10):
+        return rag.vector_store.search("", k=k)
+
+    async def fake_agenerate(context: str, question: str) -> str:
+        return "LVMH revenue in 2023 was 86,153 million euros [Page 10]."
+
+    monkeypatch.setattr(rag.vector_store, "search_by_embedding", fake_search_by_embedding)
+    monkeypatch.setattr(rag.llm, "agenerate", fake_agenerate)
+
+    async def scenario():
+        first = await rag.aquery("What was LVMH revenue in 2023?")
+        second = await rag.aquery("What was LVMH revenue in 2023?")
+        await rag.embed_batcher.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first["from_cache"] is False
+    assert "86,153" in first["answer"]
+    assert first["sources"][0]["page"] == 10
+    assert second["from_cache"] is True
+
+
+def test_astream_yields_tokens_then_result(rag, monkeypatch):
+    """
+    EN: astream: token events, then a final event with the full result (cached).
+    FR: Le texte reconstitué = la réponse finale; 2e appel = un seul chunk (cache).
+    """
+    import asyncio
+
+    def fake_search_by_embedding(embedding, k=10):
+        return rag.vector_store.search("", k=k)
+
+    async def fake_astream(context: str, question: str):
+        for token in ["LVMH revenue ", "was 86,153 ", "million euros [Page 10]."]:
+            yield token
+
+    monkeypatch.setattr(rag.vector_store, "search_by_embedding", fake_search_by_embedding)
+    monkeypatch.setattr(rag.llm, "astream", fake_astream)
+
+    async def collect():
+        return [e async for e in rag.astream("What was LVMH revenue in 2023?")]
+
+    async def scenario():
+        first = await collect()
+        second = await collect()
+        await rag.embed_batcher.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    tokens = [e["token"] for e in first if "token" in e]
+    final = first[-1]
+    assert len(tokens) == 3
+    assert final["done"] is True
+    assert final["answer"] == "".join(tokens).strip()
+    assert final["from_cache"] is False
+    assert final["sources"][0]["page"] == 10
+
+    assert second[0]["token"] == final["answer"]
+    assert second[-1]["from_cache"] is True
+
+
+def test_failed_generation_is_not_cached(rag, monkeypatch):
+    """
+    EN: The LLM error answer is returned but never stored in the cache.
+    FR: Une panne Groq ne doit pas être resservie pendant une heure.
+    """
+    from src.llm_client import _ERROR_ANSWER
+
+    monkeypatch.setattr(rag.llm, "generate", lambda context, question: _ERROR_ANSWER)
+
+    q = "What was LVMH revenue in 2023?"
+    assert rag.query(q, use_cache=True)["answer"] == _ERROR_ANSWER
+    assert rag.query(q, use_cache=True)["from_cache"] is False
+    assert len(rag.cache) == 0
+
+
+def test_astream_error_after_tokens_propagates(rag, monkeypatch):
+    """
+    EN: A Groq failure mid-stream raises (error event) instead of a truncated answer.
+    FR: Réponse tronquée => pas de "done" normal, rien en cache.
+    """
+    import asyncio
+
+    def fake_search_by_embedding(embedding, k=10):
+        return rag.vector_store.search("", k=k)
+
+    async def failing_astream(context: str, question: str):
+        yield "LVMH revenue "
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(rag.vector_store, "search_by_embedding", fake_search_by_embedding)
+    monkeypatch.setattr(rag.llm, "astream", failing_astream)
+
+    events = []
+
+    async def scenario():
+        try:
+            async for event in rag.astream("What was LVMH revenue in 2023?"):
+                events.append(event)
+        finally:
+            await rag.embed_batcher.aclose()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+
+    assert events == [{"token": "LVMH revenue "}]
+    assert len(rag.cache) == 0
@@ -0,0 +1,105 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.reranker import Reranker
+
+
+def test_financial_boost_reorders_docs():
+    """
+    EN: With equal similarity, the chunk with financial terms + numbers ranks first.
+    FR: Boost financier (termes + chiffres) appliqué au score final.
+    """
+    plain = Document(page_content="The group opened new stores in Asia.", metadata={})
+    financial = Document(
+        page_content="Revenue reached EUR 86,153 million.",
+        metadata={"has_numbers": True},
+    )
+
+    ranked = Reranker().rerank("operating margin", [(plain, 0.5), (financial, 0.5)], top_k=2)
+
+    assert ranked[0][0] is financial
+    assert ranked[0][1] > ranked[1][1]
+
+
+def test_financial_hit_is_cached_on_metadata():
+    """
+    EN: The keyword scan runs once per doc, the flag is kept in metadata.
+    FR: Substring, insensible à la casse (comme l'ancien `k in text.lower()`).
+    """
+    doc = Document(page_content="Net SALES in Europe", metadata={})
+    assert Reranker._financial_hit(doc) is True
+    assert doc.metadata["fin_hit"] is True
+
+    other = Document(page_content="Maisons and craftsmanship", metadata={})
+    assert Reranker._financial_hit(other) is False
+    assert other.metadata["fin_hit"] is False
+
+
+def test_precomputed_features_match_fallback():
+    """
+    EN: Ingest-time features (tokens, word_count, fin_hit) give the same scores
+        as recomputing from the raw text.
+    FR: Fallback conservé pour les docs sans features (anciennes bases, tests).
+    """
+    from src.reranker import has_financial_terms, token_string
+
+    text = "Net sales grew 13% in Fashion & Leather Goods, driven by Louis Vuitton."
+    raw = Document(page_content=text, metadata={"has_numbers": True})
+    enriched = Document(
+        page_content=text,
+        metadata={
+            "has_numbers": True,
+            "tokens": token_string(text),
+            "word_count": len(text.split()),
+            "fin_hit": has_financial_terms(text),
+        },
+    )
+
+    reranker = Reranker()
+    query = "Fashion net sales growth"
+    (_, raw_score), = reranker.rerank(query, [(raw, 0.7)], top_k=1)
+    (_, enriched_score), = reranker.rerank(query, [(enriched, 0.7)], top_k=1)
+
+    assert enriched_score == raw_score
+
+
+def test_rerank_scores_match_weighted_formula():
+    """
+    EN: Vectorized scoring = 0.6*sim + 0.2*keywords + 0.1*length + 0.1*boost.
+    FR: top_k respecté, scores en float Python.
+    """
+    docs = [
+        (Document(page_content=" ".join(["word"] * 200), metadata={}), 0.9),
+        (Document(page_content="revenue 2023", metadata={"has_numbers": True}), 0.4),
+        (Document(page_content="stores", metadata={}), 0.1),
+    ]
+
+    ranked = Reranker().rerank("revenue", docs, top_k=2)
+
+    assert len(ranked) == 2
+    doc, score = ranked[0]
+    assert doc is docs[0][0]
+    assert isinstance(score, float)
+    assert score == pytest.approx(0.6 * 0.9 + 0.1 * 1.0)
+
+    length = 1.0 / (1.0 + 198 / 200)
+    assert ranked[1][1] == pytest.approx(0.6 * 0.4 + 0.2 * 1.0 + 0.1 * length + 0.1 * 0.25)
+
+
+def test_top1_matches_full_ranking():
+    """
+    EN: top_k=1 fast path returns the head of the full ranking (ties included).
+    FR: argmax = même départage que le tri stable.
+    """
+    docs = [
+        (Document(page_content="stores in Asia", metadata={}), 0.5),
+        (Document(page_content="stores in Japan", metadata={}), 0.5),
+        (Document(page_content="net sales 2023", metadata={"has_numbers": True}), 0.3),
+    ]
+    reranker = Reranker()
+
+    full = reranker.rerank("stores", docs, top_k=3)
+    top1 = reranker.rerank("stores", docs, top_k=1)
+
+    assert top1 == full[:1]
+    assert top1[0][0] is docs[0][0]
@@ -1,4 +1,7 @@
+import numpy as np
 import pytest
+from langchain_core.documents import Document
+
 from src.vector_store import VectorStore
 
 
@@ -46,3 +49,240 @@ def test_stats(vector_store):
     stats = vector_store.stats()
     assert "total_docs" in stats
     assert stats["total_docs"] > 0
+
+
+@pytest.fixture
+def flat_store():
+    """
+    EN: Factory for a VectorStore without model nor Chroma (injected matrix + docs).
+    FR: Scan exact seul: pas de DB ni de modèle à charger.
+    """
+    def make(matrix, embeddings=None):
+        store = VectorStore.__new__(VectorStore)
+        store.db = object()
+        store.embeddings = embeddings
+        store._matrix = matrix
+        store._docs = [Document(page_content=f"chunk {i}", metadata={"page": i}) for i in range(len(matrix))]
+        store._l2_space = False
+        return store
+
+    return make
+
+
+def test_flat_search_topk_and_scores(flat_store):
+    """
+    EN: Exact in-memory scan: top-k by cosine, same 1/(1+dist) scale as Chroma.
+    FR: Pas besoin de la DB ni du modèle (matrice injectée).
+    """
+    store = flat_store(np.eye(4, dtype=np.float32))
+
+    results = store._flat_search(np.array([0.0, 3.0, 1.0, 0.0]), k=2)
+
+    assert [d.metadata["page"] for d, _ in results] == [1, 2]
+    cos = 3.0 / np.sqrt(10.0)
+    assert results[0][1] == pytest.approx(1.0 / (2.0 - cos), rel=1e-5)
+    assert len(store._flat_search(np.ones(4), k=10)) == 4
+
+
+def test_flat_search_float16_matrix_keeps_ranking(flat_store, monkeypatch):
+    """
+    EN: A float16 matrix gives the same top-k (scored in float32 row blocks).
+    FR: Demi-précision = matrice 2x plus petite, même classement.
+    """
+    import src.vector_store as vs
+
+    monkeypatch.setattr(vs, "_FLAT_BLOCK_ROWS", 64)  # 200 lignes => 4 blocs
+
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(200, 384)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    query = matrix[7] + 0.1 * matrix[42]
+
+    store = flat_store(matrix)
+    ref = store._flat_search(query, k=5)
+    store._matrix = matrix.astype(np.float16)
+    got = store._flat_search(query, k=5)
+
+    assert [d.metadata["page"] for d, _ in got] == [d.metadata["page"] for d, _ in ref]
+    assert all(isinstance(s, float) for _, s in got)
+    assert np.allclose([s for _, s in got], [s for _, s in ref], atol=1e-3)
+
+
+def test_search_reuses_cached_query_embedding(flat_store, tmp_path):
+    """
+    EN: Repeated queries skip the model forward pass (query LRU).
+    FR: Boutons démo / retries => un seul embedding par question.
+    """
+    from src.embedding_cache import CachedEmbeddings
+
+    class CountingModel:
+        calls = 0
+
+        def embed_query(self, text):
+            CountingModel.calls += 1
+            return [1.0, 0.0]
+
+    store = flat_store(
+        np.eye(2, dtype=np.float32),
+        embeddings=CachedEmbeddings(CountingModel(), db_path=tmp_path / "e.sqlite3", model_name="m")
+    )
+
+    first = store.search("revenue 2023", k=1)
+    second = store.search("revenue 2023", k=1)
+
+    assert CountingModel.calls == 1
+    assert first[0][0] is second[0][0] is store._docs[0]
+
+
+def test_search_with_query_embedding_skips_model(flat_store):
+    """
+    EN: A Query carrying its embedding (semantic cache) is searched without re-embedding.
+    FR: Question tokenisée / embeddée une seule fois pour tout le pipeline.
+    """
+    from src.query import Query
+
+    class NoModel:
+        def embed_query(self, text):
+            raise AssertionError("query should not be re-embedded")
+
+    store = flat_store(np.eye(2, dtype=np.float32), embeddings=NoModel())
+
+    q = Query.from_text("  Net Sales 2023 ", embedding=np.array([0.0, 1.0], dtype=np.float32))
+    results = store.search(q, k=1)
+
+    assert q.tokens == frozenset({"net", "sales", "2023"})
+    assert results[0][0] is store._docs[1]
+
+
+def test_exists_checks_chroma_file(tmp_path):
+    """
+    EN: exists() is a plain bool, True only once chroma.sqlite3 is there.
+    FR: Un seul stat() au lieu d'un glob du dossier.
+    """
+    store = VectorStore.__new__(VectorStore)
+    store.db_path = tmp_path / "chroma"
+
+    assert store.exists() is False
+    store.db_path.mkdir()
+    assert store.exists() is False
+    (store.db_path / "chroma.sqlite3").touch()
+    assert store.exists() is True
+
+
+def test_to_similarity_keeps_chroma_order():
+    """
+    EN: Distances sorted ascending map to scores sorted descending, same order.
+    FR: 1/(1+dist) est monotone: l'ordre Chroma est conservé sans re-tri.
+    """
+    store = VectorStore.__new__(VectorStore)
+    docs = [Document(page_content=f"chunk {i}") for i in range(4)]
+    dists = [0.05, 0.2, 0.2, 0.9]
+
+    results = store._to_similarity(list(zip(docs, dists)))
+
+    assert [doc for doc, _ in results] == docs
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == pytest.approx(1.0 / 1.05)
+
+
+def test_flat_matrix_persisted_and_memory_mapped(tmp_path, monkeypatch):
+    """
+    EN: The matrix is exported once to .npy, then reopened as a read-only mmap.
+    FR: Workers uvicorn => mêmes pages partagées; fichier refait si la collection change.
+    """
+    import hashlib
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import Embeddings
+    from src.config import Config
+
+    class HashEmbeddings(Embeddings):
+        def embed_query(self, text):
+            digest = hashlib.sha256(text.encode()).digest()
+            return (np.frombuffer(digest, dtype=np.uint8)[:8].astype(np.float32) - 127).tolist()
+
+        def embed_documents(self, texts):
+            return [self.embed_query(t) for t in texts]
+
+    monkeypatch.setattr(Config, "flat_matrix_path", tmp_path / "flat_embeddings.npy")
+    db = Chroma.from_documents(
+        [Document(page_content=f"chunk {i}", metadata={"page": i}) for i in range(20)],
+        HashEmbeddings(),
+        persist_directory=str(tmp_path / "chroma"),
+        collection_name="test_flat",
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+
+    store = VectorStore.__new__(VectorStore)
+    store.db = db
+    store._load_matrix()
+
+    assert Config.flat_matrix_path.is_file()
+    assert isinstance(store._matrix, np.memmap)
+    assert store._matrix.shape == (20, 8)
+    assert np.allclose(np.linalg.norm(store._matrix, axis=1), 1.0, atol=1e-5)
+
+    # Reload: file reused, rows still aligned with docs
+    first_mtime = Config.flat_matrix_path.stat().st_mtime_ns
+    store._load_matrix()
+    assert Config.flat_matrix_path.stat().st_mtime_ns == first_mtime
+    (doc, score), = store._flat_search(HashEmbeddings().embed_query("chunk 7"), k=1)
+    assert doc.metadata["page"] == 7
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+    # Collection changed => stale file rebuilt
+    db.add_documents([Document(page_content="chunk 20", metadata={"page": 20})])
+    store._load_matrix()
+    assert store._matrix.shape == (21, 8)
+
+
+def test_embeddings_shared_between_instances(monkeypatch):
+    """
+    EN: The embedding model is loaded once per process unless sharing is disabled.
+    FR: Config.share_embeddings=False => un modèle par instance (isolation).
+    """
+    from src.config import Config
+
+    loads = []
+
+    def fake_load():
+        loads.append(object())
+        return loads[-1]
+
+    monkeypatch.setattr(VectorStore, "_embed_singleton", None)
+    monkeypatch.setattr(VectorStore, "_load_embeddings", staticmethod(fake_load))
+    monkeypatch.setattr(VectorStore, "exists", lambda self: False)
+
+    monkeypatch.setattr(Config, "share_embeddings", True)
+    first, second = VectorStore(), VectorStore()
+    assert first.embeddings is second.embeddings
+    assert len(loads) == 1
+
+    monkeypatch.setattr(Config, "share_embeddings", False)
+    assert VectorStore().embeddings is not first.embeddings
+    assert len(loads) == 2
+
+
+def test_int8_embeddings_run_on_cpu(monkeypatch, tmp_path):
+    """
+    EN: EMBEDDING_INT8 loads the ONNX export on CPU even if a GPU was detected.
+    FR: Le modèle quantifié avx2 ne tourne pas sur cuda sans onnxruntime-gpu.
+    """
+    import src.vector_store as vs
+    from src.config import Config
+
+    captured = {}
+
+    def fake_hf(**kwargs):
+        captured.update(kwargs)
+        return object()
+
+    monkeypatch.setattr(vs, "HuggingFaceEmbeddings", fake_hf)
+    monkeypatch.setattr(Config, "embedding_int8", True)
+    monkeypatch.setattr(Config, "embedding_device", "cuda")
+    monkeypatch.setattr(Config, "embedding_cache_path", tmp_path / "emb.sqlite3")
+
+    VectorStore._load_embeddings()
+
+    assert captured["model_kwargs"]["device"] == "cpu"
+    assert captured["model_kwargs"]["backend"] == "onnx"
@@ -1,10 +1,15 @@
+import json
 import os
 import time
 from datetime import datetime
+from html import escape
+from string import Template
 from typing import Dict, Any, Optional, List
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 # =========================
@@ -87,37 +92,140 @@ st.markdown("""
 .badge-med { border-color: rgba(245,158,11,0.4); background: rgba(245,158,11,0.14); color:#92400e; }
 .badge-low { border-color: rgba(239,68,68,0.4); background: rgba(239,68,68,0.12); color:#7f1d1d; }
 
+details.snippet {
+    border: 1px solid #E5E7EB;
+    border-radius: 12px;
+    padding: 10px 14px;
+    margin-bottom: 8px;
+}
+details.snippet summary { cursor: pointer; font-weight: 700; }
+
 hr { border: none; border-top: 1px solid #E5E7EB; margin: 1.1rem 0; }
 </style>
 """, unsafe_allow_html=True)
 
+# =========================
+# HTML templates (built once at import, filled on each rerun)
+# =========================
+HERO_TMPL = Template("""
+<div class="hero">
+    <div class="hero-title">🚀 LVMH Financial Intelligence</div>
+    <div class="hero-sub">
+        Executive-grade RAG dashboard for corporate reporting — multi-language (FR/EN),
+        traceable answers with sources, and performance analytics (latency, cache).
+    </div>
+    <div>
+        <span class="pill">
+            <span class="dot $dot_class"></span>
+            $status
+        </span>
+        <span class="pill">RAG • Vector Search → Rerank → LLM</span>
+        <span class="pill">Finance-ready: sources + audit trail</span>
+    </div>
+</div>
+<br/>
+<div class='section-title'>$section</div>
+<div class='small-muted'>$section_sub</div>
+""")
+
+KPI_TMPL = Template("""
+<div class="kpi-wrap">
+    <div class="kpi">
+        <div class="kpi-label">Vector DB</div>
+        <div class="kpi-value">$total_docs</div>
+        <div class="kpi-sub">chunks indexed</div>
+    </div>
+    <div class="kpi">
+        <div class="kpi-label">Avg Latency (E2E)</div>
+        <div class="kpi-value">$e2e</div>
+        <div class="kpi-sub">includes cache hits</div>
+    </div>
+    <div class="kpi">
+        <div class="kpi-label">Avg Latency (Uncached)</div>
+        <div class="kpi-value">$uncached</div>
+        <div class="kpi-sub">real pipeline cost (no cache)</div>
+    </div>
+    <div class="kpi">
+        <div class="kpi-label">Cache Hit Rate</div>
+        <div class="kpi-value">$hit_rate%</div>
+        <div class="kpi-sub">cache size: $cache_size</div>
+    </div>
+</div>
+<br/>
+<div class="card">
+    <b>Embedding model:</b> <code>$model</code><br/>
+    <b>Pipeline:</b> Vector Search → Reranking → LLM Generation<br/>
+    <b>Traceability:</b> sources + evidence + confidence scoring
+</div>
+""")
+
+BADGE_TMPL = Template("<span class='badge $klass'>CONFIDENCE: $level &nbsp;•&nbsp; Score: $score</span>")
+BADGE_CLASS = {"HIGH": "badge-high", "MEDIUM": "badge-med"}
+
+SNIPPET_TMPL = Template(
+    "<details class='snippet'><summary>$label $i — Page $page — score $score</summary>$text</details>"
+)
+
+PAGES = {
+    "Executive Summary": "High-level KPIs + system performance. Designed for stakeholder demos.",
+    "Ask (Chat)": "Ask questions in French or English. Answers come with sources.",
+}
+
 # =========================
 # API config
 # =========================
 DEFAULT_API = os.getenv("RAG_API_URL", "http://127.0.0.1:8000")
 
 
+def http_session() -> requests.Session:
+    """One keep-alive session (connection pool) per Streamlit session."""
+    if "http" not in st.session_state:
+        s = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=2, backoff_factor=0.1),
+        )
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        st.session_state.http = s
+    return st.session_state.http
+
+
+# Health / metrics are re-read on every rerun (each widget change): short TTL cache
+@st.cache_data(ttl=5, show_spinner=False)
 def api_is_up(api_base: str) -> bool:
     try:
-        r = requests.get(f"{api_base}/health", timeout=5)
+        r = http_session().get(f"{api_base}/health", timeout=5)
         return r.status_code == 200
     except Exception:
         return False
 
 
-def call_query(api_base: str, payload: dict, timeout_s: int) -> dict:
-    t0 = time.time()
-    r = requests.post(f"{api_base}/query", json=payload, timeout=timeout_s)
-    elapsed_ms = int((time.time() - t0) * 1000)
-    if r.status_code != 200:
-        raise RuntimeError(f"API error {r.status_code}: {r.text}")
-    data = r.json()
-    data.setdefault("latency_ms", elapsed_ms)
-    return data
-
-
+def call_query_stream(api_base: str, payload: dict, timeout_s: int, out: dict):
+    """Yield answer tokens from /query/stream (NDJSON); the final result is stored in `out`."""
+    t0 = time.perf_counter()
+    with http_session().post(
+        f"{api_base}/query/stream", json=payload, timeout=timeout_s, stream=True
+    ) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"API error {r.status_code}: {r.text}")
+        for line in r.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if "token" in event:
+                yield event["token"]
+            elif event.get("done"):
+                if "error" in event:
+                    raise RuntimeError(f"API error: {event['error']}")
+                out.update(event)
+    out.setdefault("latency_ms", int((time.perf_counter() - t0) * 1000))
+
+
+@st.cache_data(ttl=30, show_spinner=False)
 def call_metrics(api_base: str) -> dict:
-    r = requests.get(f"{api_base}/metrics", timeout=10)
+    r = http_session().get(f"{api_base}/metrics", timeout=10)
     if r.status_code != 200:
         raise RuntimeError(f"Metrics error {r.status_code}: {r.text}")
     return r.json()
@@ -135,15 +243,33 @@ def fmt_ms(x: Optional[float]) -> str:
 def confidence_badge(conf: Dict[str, Any]) -> str:
     level = (conf or {}).get("level", "LOW")
     score = (conf or {}).get("score", 0.0)
+    return BADGE_TMPL.substitute(
+        klass=BADGE_CLASS.get(level, "badge-low"), level=level, score=f"{score:.3f}"
+    )
+
+
+def snippet_cards(items: List[Dict[str, Any]], label: str, text_key: str) -> str:
+    """All evidence / source cards as one HTML payload (one st.markdown call)."""
+    return "".join(
+        SNIPPET_TMPL.substitute(
+            label=label,
+            i=i,
+            page=escape(str(item.get("page", "?"))),
+            score=escape(str(item.get("score", "?"))),
+            text=escape(item.get(text_key, "") or ""),
+        )
+        for i, item in enumerate(items, 1)
+    )
 
-    if level == "HIGH":
-        klass = "badge badge-high"
-    elif level == "MEDIUM":
-        klass = "badge badge-med"
-    else:
-        klass = "badge badge-low"
 
-    return f"<span class='{klass}'>CONFIDENCE: {level} &nbsp;•&nbsp; Score: {score:.3f}</span>"
+def render_snippets(data: Dict[str, Any]) -> None:
+    html = ""
+    if show_evidence:
+        html += snippet_cards((data.get("evidence", []) or [])[:3], "Evidence", "snippet")
+    if show_sources:
+        html += snippet_cards((data.get("sources", []) or [])[:8], "Source", "preview")
+    if html:
+        st.markdown(html, unsafe_allow_html=True)
 
 
 # =========================
@@ -177,36 +303,20 @@ with st.sidebar:
 up = api_is_up(api_base)
 
 st.markdown(
-    f"""
-    <div class="hero">
-        <div class="hero-title">🚀 LVMH Financial Intelligence</div>
-        <div class="hero-sub">
-            Executive-grade RAG dashboard for corporate reporting — multi-language (FR/EN),
-            traceable answers with sources, and performance analytics (latency, cache).
-        </div>
-        <div>
-            <span class="pill">
-                <span class="dot {'dot-green' if up else 'dot-red'}"></span>
-                {'API ONLINE' if up else 'API OFFLINE'}
-            </span>
-            <span class="pill">RAG • Vector Search → Rerank → LLM</span>
-            <span class="pill">Finance-ready: sources + audit trail</span>
-        </div>
-    </div>
-    """,
+    HERO_TMPL.substitute(
+        dot_class="dot-green" if up else "dot-red",
+        status="API ONLINE" if up else "API OFFLINE",
+        section=view_mode,
+        section_sub=PAGES[view_mode],
+    ),
     unsafe_allow_html=True
 )
-
 st.write("")
 
 # =========================
 # Executive Summary
 # =========================
 if view_mode == "Executive Summary":
-    st.markdown("<div class='section-title'>Executive Summary</div>", unsafe_allow_html=True)
-    st.markdown("<div class='small-muted'>High-level KPIs + system performance. Designed for stakeholder demos.</div>", unsafe_allow_html=True)
-    st.write("")
-
     if not up:
         st.warning("API is offline. Start it first: `uvicorn api.app:app --host 0.0.0.0 --port 8000`")
     else:
@@ -225,43 +335,23 @@ if view_mode == "Executive Summary":
         cache_size = m.get("cache_size", 0)
 
         st.markdown(
-            f"""
-            <div class="kpi-wrap">
-                <div class="kpi">
-                    <div class="kpi-label">Vector DB</div>
-                    <div class="kpi-value">{int(total_docs):,}</div>
-                    <div class="kpi-sub">chunks indexed</div>
-                </div>
-                <div class="kpi">
-                    <div class="kpi-label">Avg Latency (E2E)</div>
-                    <div class="kpi-value">{fmt_ms(avg_e2e)}</div>
-                    <div class="kpi-sub">includes cache hits</div>
-                </div>
-                <div class="kpi">
-                    <div class="kpi-label">Avg Latency (Uncached)</div>
-                    <div class="kpi-value">{fmt_ms(avg_uncached)}</div>
-                    <div class="kpi-sub">real pipeline cost (no cache)</div>
-                </div>
-                <div class="kpi">
-                    <div class="kpi-label">Cache Hit Rate</div>
-                    <div class="kpi-value">{cache_rate*100:.1f}%</div>
-                    <div class="kpi-sub">cache size: {cache_size}</div>
-                </div>
-            </div>
-            """,
+            KPI_TMPL.substitute(
+                total_docs=f"{int(total_docs):,}",
+                e2e=fmt_ms(avg_e2e),
+                uncached=fmt_ms(avg_uncached),
+                hit_rate=f"{cache_rate*100:.1f}",
+                cache_size=cache_size,
+                model=escape(str(db_stats.get("model", "unknown"))),
+            ),
             unsafe_allow_html=True
         )
 
         st.write("")
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"**Embedding model:** `{db_stats.get('model', 'unknown')}`")
-        st.markdown("**Pipeline:** Vector Search → Reranking → LLM Generation")
-        st.markdown("**Traceability:** sources + evidence + confidence scoring")
-        st.markdown("</div>", unsafe_allow_html=True)
-
-        st.write("")
-        st.markdown("<div class='section-title'>Quick Demo</div>", unsafe_allow_html=True)
-        st.markdown("<div class='small-muted'>One-click questions to show value quickly.</div>", unsafe_allow_html=True)
+        st.markdown(
+            "<div class='section-title'>Quick Demo</div>"
+            "<div class='small-muted'>One-click questions to show value quickly.</div>",
+            unsafe_allow_html=True
+        )
 
         demo_qs = [
             "What was LVMH revenue in 2023?",
@@ -282,13 +372,15 @@ if view_mode == "Executive Summary":
                 "use_cache": bool(use_cache),
             }
             try:
-                data = call_query(api_base, payload, timeout_s=timeout_s)
-                answer = data.get("answer", "")
+                data: Dict[str, Any] = {}
+                st.write("")
+                # Tokens rendered as they arrive (first words before the LLM finishes)
+                with st.container(border=True):
+                    streamed = st.write_stream(call_query_stream(api_base, payload, timeout_s, data))
+                answer = data.get("answer", streamed)
                 conf = data.get("confidence", {}) or {}
 
-                st.write("")
                 st.markdown(confidence_badge(conf), unsafe_allow_html=True)
-                st.markdown(f"<div class='answer'>{answer}</div>", unsafe_allow_html=True)
 
                 st.caption(
                     f"Latency: {data.get('latency_ms','?')} ms | "
@@ -309,17 +401,7 @@ if view_mode == "Executive Summary":
                     }
                 })
 
-                if show_evidence:
-                    ev = data.get("evidence", []) or []
-                    for i, e in enumerate(ev[:3], 1):
-                        with st.expander(f"Evidence {i} — Page {e.get('page','?')} — score {e.get('score','?')}"):
-                            st.write(e.get("snippet", ""))
-
-                if show_sources:
-                    sources = data.get("sources", []) or []
-                    for i, s in enumerate(sources[:8], 1):
-                        with st.expander(f"Source {i} — Page {s.get('page','?')} — score {s.get('score','?')}"):
-                            st.write(s.get("preview", ""))
+                render_snippets(data)
 
             except Exception as e:
                 st.error(f"Query failed: {e}")
@@ -343,10 +425,6 @@ if view_mode == "Executive Summary":
 # Chat
 # =========================
 else:
-    st.markdown("<div class='section-title'>Ask (Chat)</div>", unsafe_allow_html=True)
-    st.markdown("<div class='small-muted'>Ask questions in French or English. Answers come with sources.</div>", unsafe_allow_html=True)
-    st.write("")
-
     if not up:
         st.warning("API is offline. Start it: `uvicorn api.app:app --host 0.0.0.0 --port 8000`")
     else:
@@ -359,32 +437,21 @@ else:
                 "use_cache": bool(use_cache),
             }
             try:
-                data = call_query(api_base, payload, timeout_s=timeout_s)
-                answer = data.get("answer", "")
+                data: Dict[str, Any] = {}
+                with st.container(border=True):
+                    st.markdown(f"**Q:** {question}")
+                    streamed = st.write_stream(call_query_stream(api_base, payload, timeout_s, data))
+                answer = data.get("answer", streamed)
                 conf = data.get("confidence", {}) or {}
 
                 st.markdown(confidence_badge(conf), unsafe_allow_html=True)
-                st.markdown(
-                    f"<div class='answer'><b>Q:</b> {question}<br/><b>A:</b> {answer}</div>",
-                    unsafe_allow_html=True
-                )
 
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Latency (ms)", int(data.get("latency_ms", 0)))
                 c2.metric("Cache", "HIT" if data.get("from_cache") else "MISS")
                 c3.metric("Sources", len(data.get("sources", []) or []))
 
-                if show_evidence:
-                    ev = data.get("evidence", []) or []
-                    for i, e in enumerate(ev[:3], 1):
-                        with st.expander(f"Evidence {i} — Page {e.get('page','?')} — score {e.get('score','?')}"):
-                            st.write(e.get("snippet", ""))
-
-                if show_sources:
-                    sources = data.get("sources", []) or []
-                    for i, s in enumerate(sources[:8], 1):
-                        with st.expander(f"Source {i} — Page {s.get('page','?')} — score {s.get('score','?')}"):
-                            st.write(s.get("preview", ""))
+                render_snippets(data)
 
                 st.session_state.history.insert(0, {
                     "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),